@@ -0,0 +1,267 @@
+"""Offline render benchmark for weather cards.
+
+Renders a matrix of synthetic weather_data dicts (day/night, every emoji
+branch, en/ru, long city names, extreme temperatures) and reports the
+median time of each stage (compose, text, encode), Python allocation
+peaks and output sizes. Results are compared to benchmarks/baseline.json
+and the run fails when a stage is over its budget.
+
+    python benchmarks/render_bench.py                    # check against baseline
+    python benchmarks/render_bench.py --update-baseline  # record a new baseline
+    python benchmarks/render_bench.py --full --format webp
+    python benchmarks/render_bench.py --batch 4          # N cards of one answer vs one card
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import itertools
+import statistics
+import tracemalloc
+from datetime import datetime
+from typing import Any, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(ROOT, "benchmarks", "baseline.json")
+
+# Assets are loaded by relative path and config insists on credentials,
+# neither of which the benchmark needs
+os.chdir(ROOT)
+sys.path.insert(0, ROOT)
+for var in ("BOT_TOKEN", "OPENWEATHERMAP_API_KEY", "IMGBB_API_KEY"):
+    os.environ.setdefault(var, "benchmark")
+
+from utils import image  # noqa: E402
+
+
+STAGES = ("compose", "text", "encode", "total")
+
+# One description per branch of get_weather_emoji_key
+DESCRIPTIONS = (
+    "clear sky",
+    "few clouds",
+    "overcast clouds",
+    "light rain",
+    "heavy intensity rain",
+    "thunderstorm",
+    "snow",
+    "mist",
+    "tornado",
+    "cyclone",
+    "freezing ice",
+    "unknown phenomenon",
+)
+CITIES = ("Moscow", "Llanfairpwllgwyngyllgogerychwyrndrobwllllantysiliogogogoch")
+TEMPERATURES = (0.0, -89.2, 56.7)
+LANGS = ("en", "ru")
+TIMES = (datetime(2026, 1, 5, 14, 7), datetime(2026, 1, 5, 2, 7))
+
+
+def make_weather_data(
+    description: str, current_time_local: datetime, lang: str, city: str, temp: float
+) -> Dict[str, Any]:
+    return {
+        "city": city,
+        "country": "RU",
+        "temp": temp,
+        "feels_like": temp - 7.3,
+        "humidity": 100,
+        "pressure": 1084,
+        "wind_speed": 113.2,
+        "wind_dir": "СЗ" if lang == "ru" else "NW",
+        "description": description,
+        "sunrise": "06:12",
+        "sunset": "18:40",
+        "timezone_offset": 10800,
+        "current_time_local": current_time_local,
+        "lang": lang,
+    }
+
+
+def build_matrix(full: bool) -> List[Dict[str, Any]]:
+    if full:
+        return [
+            make_weather_data(*case)
+            for case in itertools.product(DESCRIPTIONS, TIMES, LANGS, CITIES, TEMPERATURES)
+        ]
+
+    # Every description, theme and language; city and temperature rotate
+    variants = itertools.cycle(itertools.product(CITIES, TEMPERATURES))
+    return [
+        make_weather_data(description, current_time_local, lang, *next(variants))
+        for description, current_time_local, lang
+        in itertools.product(DESCRIPTIONS, TIMES, LANGS)
+    ]
+
+
+def measure(trace: bool, stage_fn, *args):
+    # tracemalloc slows allocations down, so traced runs are not timed
+    if trace:
+        tracemalloc.start()
+    start_time = time.perf_counter()
+    result = stage_fn(*args)
+    elapsed = time.perf_counter() - start_time
+    peak = 0
+    if trace:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def run_case(weather_data: Dict[str, Any], fmt: str, trace: bool = False) -> Dict[str, float]:
+    is_night = image.is_night_time(weather_data["current_time_local"])
+
+    main_img, compose_time, compose_peak = measure(
+        trace, image.compose_card_base, weather_data, is_night
+    )
+    _, text_time, text_peak = measure(
+        trace, image.draw_card_text, main_img, weather_data, is_night
+    )
+    (card_bytes, _), encode_time, encode_peak = measure(
+        trace, image.encode_card, main_img, fmt
+    )
+    return {
+        "compose": compose_time,
+        "text": text_time,
+        "encode": encode_time,
+        "total": compose_time + text_time + encode_time,
+        "peak_alloc": max(compose_peak, text_peak, encode_peak),
+        "bytes": len(card_bytes),
+    }
+
+
+def run(matrix: List[Dict[str, Any]], fmt: str, repeat: int) -> Dict[str, Any]:
+    # Warm the layer and sprite caches so the first case is not an outlier
+    for weather_data in matrix:
+        image.draw_weather_card(weather_data)
+
+    samples: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+    peaks, sizes = [], []
+    for weather_data in matrix:
+        traced = run_case(weather_data, fmt, trace=True)
+        peaks.append(traced["peak_alloc"])
+        sizes.append(traced["bytes"])
+
+        for _ in range(repeat):
+            result = run_case(weather_data, fmt)
+            for stage in STAGES:
+                samples[stage].append(result[stage] * 1000)
+
+    return {
+        "format": fmt,
+        "cases": len(matrix),
+        "stages_ms": {
+            stage: {
+                "median": round(statistics.median(values), 3),
+                "max": round(max(values), 3),
+            }
+            for stage, values in samples.items()
+        },
+        "peak_alloc_kb": round(max(peaks) / 1024, 1),
+        "bytes": {"median": int(statistics.median(sizes)), "max": max(sizes)},
+    }
+
+
+def run_batch(matrix: List[Dict[str, Any]], fmt: str, size: int, repeat: int) -> Dict[str, Any]:
+    """Wall time of `size` cards drawn and encoded as one render batch"""
+    cases = list(itertools.islice(itertools.cycle(matrix), size))
+    single, batch = [], []
+    for _ in range(max(repeat, 1)):
+        start_time = time.perf_counter()
+        image.encode_card(image.draw_weather_card(cases[0]), fmt)
+        single.append((time.perf_counter() - start_time) * 1000)
+
+        start_time = time.perf_counter()
+        image.encode_cards([image.draw_weather_card(case) for case in cases], fmt)
+        batch.append((time.perf_counter() - start_time) * 1000)
+
+    return {
+        "size": size,
+        "single_ms": round(statistics.median(single), 3),
+        "batch_ms": round(statistics.median(batch), 3),
+    }
+
+
+def check(report: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    tolerance = baseline.get("tolerance", 1.25)
+    # Absolute slack keeps sub-millisecond stages from failing on jitter
+    slack_ms = baseline.get("slack_ms", 1.0)
+    budgets = baseline.get("formats", {}).get(report["format"])
+    if budgets is None:
+        return []
+
+    failures = []
+    for stage, budget in budgets["stages_ms"].items():
+        measured = report["stages_ms"][stage]["median"]
+        if measured > budget * tolerance + slack_ms:
+            failures.append(
+                f"{stage}: {measured:.2f} ms > {budget:.2f} ms x {tolerance} + {slack_ms} ms"
+            )
+    if report["bytes"]["median"] > budgets["bytes"] * tolerance:
+        failures.append(
+            f"size: {report['bytes']['median']} B > {budgets['bytes']} B x {tolerance}"
+        )
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--format", default=image.CARD_FORMAT, choices=sorted(image.CARD_ENCODERS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--full", action="store_true", help="full cross product of inputs")
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--json", action="store_true", help="print the raw report")
+    parser.add_argument("--batch", type=int, default=0, help="also time a batch of N cards")
+    args = parser.parse_args()
+
+    matrix = build_matrix(args.full)
+    report = run(matrix, args.format, args.repeat)
+    if args.batch > 1:
+        report["batch"] = run_batch(matrix, args.format, args.batch, args.repeat)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{report['cases']} cases, format {report['format']}")
+        for stage, values in report["stages_ms"].items():
+            print(f"  {stage:<8} median {values['median']:>9.3f} ms   max {values['max']:>9.3f} ms")
+        print(f"  peak Python allocations {report['peak_alloc_kb']} KiB")
+        print(f"  output median {report['bytes']['median']} B, max {report['bytes']['max']} B")
+        if "batch" in report:
+            batch = report["batch"]
+            print(
+                f"  batch of {batch['size']} {batch['batch_ms']:.3f} ms, one card {batch['single_ms']:.3f} ms"
+                f" ({batch['batch_ms'] / batch['single_ms']:.2f}x)"
+            )
+
+    baseline = {"tolerance": 1.25, "slack_ms": 1.0, "formats": {}}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, encoding="utf-8") as file:
+            baseline = json.load(file)
+
+    if args.update_baseline:
+        baseline.setdefault("formats", {})[args.format] = {
+            "stages_ms": {
+                stage: values["median"] for stage, values in report["stages_ms"].items()
+            },
+            "bytes": report["bytes"]["median"],
+        }
+        with open(BASELINE_PATH, "w", encoding="utf-8") as file:
+            json.dump(baseline, file, indent=2)
+            file.write("\n")
+        print(f"Baseline for {args.format} written to {BASELINE_PATH}")
+        return
+
+    failures = check(report, baseline)
+    if failures:
+        print("Over budget:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("Within budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,14 +10,109 @@ IMGBB_API_KEY = os.getenv("IMGBB_API_KEY")
 
 # optional
 OPENWEATHERMAP_BASE_URL = os.getenv("OPENWEATHERMAP_BASE_URL") or "https://api.openweathermap.org"
+PRECOMPOSE_LAYERS = os.getenv("PRECOMPOSE_LAYERS", "false").lower() in ("1", "true", "yes")
 THREAD_POOL_WORKERS = int(os.getenv("THREAD_POOL_WORKERS", "4"))
+RENDER_EXECUTOR = os.getenv("RENDER_EXECUTOR") or "thread"  # thread | process
+RENDER_QUEUE_SIZE = int(os.getenv("RENDER_QUEUE_SIZE", "32"))
+CARD_FORMAT = os.getenv("CARD_FORMAT") or "png"  # png | png8 | webp | jpeg
+CARD_QUALITY = int(os.getenv("CARD_QUALITY", "85"))  # webp / jpeg
+CARD_EFFORT = int(os.getenv("CARD_EFFORT", "4"))  # png zlib level / webp method
 REQUEST_TIMEOUT = int(os.getenv("REQUEST_TIMEOUT", "4"))
-UPLOAD_TIMEOUT = int(os.getenv("UPLOAD_TIMEOUT", "3"))
+UPLOAD_TIMEOUT = float(os.getenv("UPLOAD_TIMEOUT", "3"))  # per upload attempt
 CACHE_TTL = int(os.getenv("CACHE_TTL", "600"))
+WEATHER_STALE_TTL = int(os.getenv("WEATHER_STALE_TTL", "21600"))  # serve expired weather this much longer
+OWM_BREAKER_FAILURES = int(os.getenv("OWM_BREAKER_FAILURES", "5"))  # failed calls in a row before pausing
+OWM_BREAKER_RESET = float(os.getenv("OWM_BREAKER_RESET", "30"))
+WEATHER_CACHE_SIZE = int(os.getenv("WEATHER_CACHE_SIZE", "50000"))
+WEATHER_CACHE_MAX_BYTES = int(os.getenv("WEATHER_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+LOCATION_CACHE_TTL = int(os.getenv("LOCATION_CACHE_TTL", "86400"))
+LOCATION_CACHE_SIZE = int(os.getenv("LOCATION_CACHE_SIZE", "50000"))
+GEO_PREFIX_LENGTH = int(os.getenv("GEO_PREFIX_LENGTH", "24"))
+GEOIP_DB_PATH = os.getenv("GEOIP_DB_PATH") or ""  # CSV: start_ip,end_ip,city,country_code
+GAZETTEER_PATH = os.getenv("GAZETTEER_PATH", "assets/data/cities.tsv")  # empty disables suggestions
+CITY_SUGGESTIONS = int(os.getenv("CITY_SUGGESTIONS", "5"))
+CITY_UPSTREAM_MIN_LENGTH = int(os.getenv("CITY_UPSTREAM_MIN_LENGTH", "4"))  # shorter prefixes only get suggestions
+CITY_MATCH_CARDS = int(os.getenv("CITY_MATCH_CARDS", "3"))  # cards for a name shared by several cities, 1 = off
+CITY_MATCH_MIN_SHARE = float(os.getenv("CITY_MATCH_MIN_SHARE", "0.1"))  # of the top match's population
+RANDOM_POOL_SIZE = int(os.getenv("RANDOM_POOL_SIZE", "10"))  # 0 disables the pool
+RANDOM_POOL_RATE = float(os.getenv("RANDOM_POOL_RATE", "20"))  # ip-api lookups per minute
+RANDOM_POOL_MAX_AGE = int(os.getenv("RANDOM_POOL_MAX_AGE", "120"))  # prepared weather older than this is fetched again
+RANDOM_POOL_PREPARE = os.getenv("RANDOM_POOL_PREPARE", "false").lower() in ("1", "true", "yes")
+PERSISTENT_CACHE_PATH = os.getenv("PERSISTENT_CACHE_PATH") or ""  # empty disables it
+PERSISTENT_CACHE_FLUSH_INTERVAL = float(os.getenv("PERSISTENT_CACHE_FLUSH_INTERVAL", "2"))
+# shared cache tier: memory (per process) | sqlite (PERSISTENT_CACHE_PATH) | shm | redis
+CACHE_BACKEND = os.getenv("CACHE_BACKEND") or ("sqlite" if PERSISTENT_CACHE_PATH else "memory")
+CACHE_SHM_PATH = os.getenv("CACHE_SHM_PATH") or "/dev/shm/weather-bot-cache.sqlite3"
+REDIS_URL = os.getenv("REDIS_URL") or "redis://127.0.0.1:6379/0"
+REDIS_POOL_SIZE = int(os.getenv("REDIS_POOL_SIZE", "8"))
+REDIS_TIMEOUT = float(os.getenv("REDIS_TIMEOUT", "0.5"))
+CARD_CACHE_TTL = int(os.getenv("CARD_CACHE_TTL", "300"))
+CARD_CACHE_SIZE = int(os.getenv("CARD_CACHE_SIZE", "1000"))
+CARD_UPLOAD = os.getenv("CARD_UPLOAD") or "imgbb"  # imgbb | telegram | local
+STORAGE_CHAT_ID = os.getenv("STORAGE_CHAT_ID") or ""  # chat the bot posts cards to for CARD_UPLOAD=telegram
+# alternate backend while CARD_UPLOAD fails, empty = answer without a card
+UPLOAD_FALLBACK = os.getenv("UPLOAD_FALLBACK", "imgbb" if CARD_UPLOAD == "telegram" and IMGBB_API_KEY else "")
+UPLOAD_HEDGE_AFTER = float(os.getenv("UPLOAD_HEDGE_AFTER", "1.5"))  # start a second attempt, 0 = only on errors
+UPLOAD_BREAKER_FAILURES = int(os.getenv("UPLOAD_BREAKER_FAILURES", "5"))  # in a row before failing over
+UPLOAD_BREAKER_RESET = float(os.getenv("UPLOAD_BREAKER_RESET", "30"))  # seconds before trying again
+# built-in image server for CARD_UPLOAD=local
+IMAGE_PUBLIC_URL = os.getenv("IMAGE_PUBLIC_URL") or ""  # base URL Telegram fetches cards from
+IMAGE_SERVER_HOST = os.getenv("IMAGE_SERVER_HOST") or "0.0.0.0"
+IMAGE_SERVER_PORT = int(os.getenv("IMAGE_SERVER_PORT", "8090"))
+IMAGE_STORE_PATH = os.getenv("IMAGE_STORE_PATH") or ""  # directory for the cards, empty = memory
+IMAGE_STORE_MAX_BYTES = int(os.getenv("IMAGE_STORE_MAX_BYTES", str(256 * 1024 * 1024)))
+INLINE_DEBOUNCE = float(os.getenv("INLINE_DEBOUNCE", "0.4"))  # wait before rendering while typing
+INLINE_TYPING_WINDOW = float(os.getenv("INLINE_TYPING_WINDOW", "2"))  # queries closer than this = typing
+PREWARM_TOP = int(os.getenv("PREWARM_TOP", "20"))  # hottest locations kept fresh, 0 disables it
+PREWARM_CARDS = int(os.getenv("PREWARM_CARDS", "5"))  # of those, how many get cards uploaded ahead
+PREWARM_INTERVAL = float(os.getenv("PREWARM_INTERVAL", "10"))
+PREWARM_LEAD = float(os.getenv("PREWARM_LEAD", "60"))  # refresh this long before expiry
+PREWARM_HALF_LIFE = float(os.getenv("PREWARM_HALF_LIFE", "900"))  # popularity decay
+PREWARM_MIN_SCORE = float(os.getenv("PREWARM_MIN_SCORE", "3"))  # decayed queries to count as hot
 
-required_vars = ["BOT_TOKEN", "OPENWEATHERMAP_API_KEY", "IMGBB_API_KEY"]
+# serving mode
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL") or ""  # e.g. a local Bot API server
+BOT_MODE = os.getenv("BOT_MODE") or "polling"  # polling | webhook
+WEBHOOK_URL = os.getenv("WEBHOOK_URL") or ""  # public https base URL
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH") or "/webhook"
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST") or "0.0.0.0"
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))  # workers use the ports right after it
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET") or ""
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "1"))
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
+WORKER_INDEX = int(os.getenv("WORKER_INDEX", "0"))  # set for each webhook worker process
+
+# metrics endpoint
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # 0 disables it, worker N serves on +N
+METRICS_HOST = os.getenv("METRICS_HOST") or "127.0.0.1"
+
+# http client pool
+IP_API_BASE_URL = os.getenv("IP_API_BASE_URL") or "http://ip-api.com"
+IMGBB_BASE_URL = os.getenv("IMGBB_BASE_URL") or "https://api.imgbb.com"
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_WARMUP_CONNECTIONS = int(os.getenv("HTTP_WARMUP_CONNECTIONS", "2"))
+HTTP2 = os.getenv("HTTP2", "false").lower() in ("1", "true", "yes")
+
+# what each card upload backend needs
+upload_vars = {"imgbb": "IMGBB_API_KEY", "telegram": "STORAGE_CHAT_ID", "local": "IMAGE_PUBLIC_URL"}
+required_vars = ["BOT_TOKEN", "OPENWEATHERMAP_API_KEY"]
+required_vars += [upload_vars[kind] for kind in (CARD_UPLOAD, UPLOAD_FALLBACK) if kind in upload_vars]
 for var in required_vars:
     if not globals()[var]:
         raise ValueError(
             f"Missing required environment variable: {var}"
         )
+
+if CARD_UPLOAD not in ("imgbb", "telegram", "local"):
+    raise ValueError(f"Unknown CARD_UPLOAD: {CARD_UPLOAD}")
+if UPLOAD_FALLBACK not in ("", "imgbb", "telegram", "local") or UPLOAD_FALLBACK == CARD_UPLOAD:
+    raise ValueError(f"Invalid UPLOAD_FALLBACK: {UPLOAD_FALLBACK}")
+if BOT_MODE not in ("polling", "webhook"):
+    raise ValueError(f"Unknown BOT_MODE: {BOT_MODE}")
+if BOT_MODE == "webhook" and not WEBHOOK_URL:
+    raise ValueError("Missing required environment variable: WEBHOOK_URL")
+if "local" in (CARD_UPLOAD, UPLOAD_FALLBACK) and BOT_MODE == "webhook" and WEBHOOK_WORKERS > 1 and not IMAGE_STORE_PATH:
+    # Workers share the port, so any of them must be able to serve any card
+    raise ValueError("IMAGE_STORE_PATH is required for CARD_UPLOAD=local with several webhook workers")
@@ -1,27 +1,72 @@
 import time
-import httpx
 import asyncio
 import hashlib
 from aiogram import types, Router, Bot
 from aiogram.enums import ParseMode
 from utils.weather import (
+    cached_weather_data,
     fetch_weather_data, 
     get_location,
-    detect_language
+    detect_language,
+    refresh_weather,
+    weather_popularity,
+    WeatherUnavailable,
 )
-from utils.image import create_weather_card_async
+from utils.image import (
+    CARD_EXTENSIONS,
+    create_weather_card_async,
+    create_weather_cards_async,
+    card_fingerprint,
+)
+from utils.cache import TTLCache
+from utils.cache_backend import TieredCache
+from utils.gazetteer import City, gazetteer, normalize_name
 from utils.settings import (
     generate_random_filename,
     cleanup_files,
     generate_random_ip,
 )
 from utils.logger import logger
-from io import BytesIO
-from config import IMGBB_API_KEY
+from utils.metrics import QUERIES_IN_FLIGHT, QUERY_SECONDS, STAGE_SECONDS, register_stats
+from utils.prewarm import PrewarmScheduler
+from utils.random_pool import RandomLocationPool
+from utils.singleflight import SingleFlight
+from utils.supersede import SUPERSEDED, LatestOnly
+from utils.upload import card_uploader, is_file_id
+from config import (
+    BOT_MODE,
+    CARD_CACHE_SIZE,
+    CARD_CACHE_TTL,
+    CARD_FORMAT,
+    CITY_MATCH_CARDS,
+    CITY_MATCH_MIN_SHARE,
+    CITY_SUGGESTIONS,
+    CITY_UPSTREAM_MIN_LENGTH,
+    INLINE_DEBOUNCE,
+    INLINE_TYPING_WINDOW,
+    PREWARM_CARDS,
+    PREWARM_INTERVAL,
+    PREWARM_MIN_SCORE,
+    PREWARM_TOP,
+    RANDOM_POOL_MAX_AGE,
+    RANDOM_POOL_PREPARE,
+    RANDOM_POOL_RATE,
+    RANDOM_POOL_SIZE,
+    WEBHOOK_WORKERS,
+)
 
 
 rt = Router(name=__name__)
 
+# Identical queries in flight at the same time share one pipeline run
+inline_flight = SingleFlight("inline")
+
+# A user's newer query cancels their older one still being processed
+user_queries = LatestOnly("inline_user")
+
+# Uploaded card URLs or Telegram file_ids keyed on the hash of what the card shows
+card_cache = TieredCache(TTLCache("cards", ttl=CARD_CACHE_TTL, max_entries=CARD_CACHE_SIZE))
+
 
 @rt.inline_query()
 async def inline_weather_query(query: types.InlineQuery, bot: Bot):
@@ -46,7 +91,15 @@ async def inline_weather_query(query: types.InlineQuery, bot: Bot):
         return
 
     try:
-        return await _inline_weather_query(query, bot)
+        with QUERIES_IN_FLIGHT.track():
+            start_time = time.time()
+            user_id = query.from_user.id
+            typing = user_queries.since_last(user_id) < INLINE_TYPING_WINDOW
+            result = await user_queries.run(user_id, _inline_weather_query, query, bot, typing)
+            if result is SUPERSEDED:
+                QUERY_SECONDS.observe(time.time() - start_time, outcome="superseded")
+                logger.debug("Query superseded by a newer one")
+            return
 
     except Exception as ex:
         logger.error("Unknown error.")
@@ -59,7 +112,7 @@ async def inline_weather_query(query: types.InlineQuery, bot: Bot):
         await query.answer(results, cache_time=1)
 
 
-async def _inline_weather_query(query: types.InlineQuery, bot: Bot):
+async def _inline_weather_query(query: types.InlineQuery, bot: Bot, typing: bool = False):
     bot_me = await bot.get_me()
     bot_username = bot_me.username
     if bot_username is None:
@@ -73,37 +126,46 @@ async def _inline_weather_query(query: types.InlineQuery, bot: Bot):
     
     is_ip = location.count(".") == 3
     city = country_code = None
+    prepared = None
+    suggestions = []
 
     if location.lower() == "random":
-        i = 0
-        while i < 3:
-            random_ip = generate_random_ip()
-            logger.debug(f"{'Regenerated' if i == 0 else 'Generated'} random IP")
-            city, country_code = await get_location(random_ip)
-
-            if city:
-                break
-            i += 1
+        pooled = random_pool.pop()
+        if pooled is not None:
+            logger.debug("Pooled random location used")
+            random_ip, city, country_code = pooled.ip, pooled.city, pooled.country_code
+            prepared = pooled.prepared
         else:
-            error_msg = (
-                "Не удалось найти случайное местоположение, попробуйте снова" 
-                if lang == "ru" else 
-                "Failed to find random location, try again"
-            )
-            results = generate_article(
-                id="random_error",
-                title="Random weather",
-                description=error_msg,
-                message_text=error_msg,
-            )
-            await query.answer(results, cache_time=1)
-            elapsed_time = time.time() - start_time
-            logger.warn("IP generation error sent")
-            return
+            i = 0
+            while i < 3:
+                random_ip = generate_random_ip()
+                logger.debug(f"{'Regenerated' if i == 0 else 'Generated'} random IP")
+                city, country_code = await _get_location(random_ip)
+
+                if city:
+                    break
+                i += 1
+            else:
+                error_msg = (
+                    "Не удалось найти случайное местоположение, попробуйте снова" 
+                    if lang == "ru" else 
+                    "Failed to find random location, try again"
+                )
+                results = generate_article(
+                    id="random_error",
+                    title="Random weather",
+                    description=error_msg,
+                    message_text=error_msg,
+                )
+                await _send_answer(query, results, cache_time=1)
+                elapsed_time = time.time() - start_time
+                QUERY_SECONDS.observe(elapsed_time, outcome="random_error")
+                logger.warn("IP generation error sent")
+                return
 
         location = random_ip
     elif is_ip:
-        city, country_code = await get_location(location)
+        city, country_code = await _get_location(location)
         if not city:
             error_title = "Ошибка определения местоположения" if lang == "ru" else "Location detection error"
             error_desc = f"IP {location} не найден" if lang == "ru" else f"IP {location} not found"
@@ -120,38 +182,63 @@ async def _inline_weather_query(query: types.InlineQuery, bot: Bot):
                 description=error_desc,
                 message_text=error_text,
             )
-            await query.answer(results, cache_time=1)
+            await _send_answer(query, results, cache_time=1)
             elapsed_time = time.time() - start_time
+            QUERY_SECONDS.observe(elapsed_time, outcome="ip_error")
             logger.warn("IP error sent")
             return
     else:
+        # Partial names are completed from the local gazetteer without
+        # touching OpenWeatherMap. Whole words starting a longer name may
+        # still be a complete name missing from the gazetteer ("Mexico" next
+        # to "Mexico City"), so once the user stops typing they are also
+        # looked up upstream
+        if gazetteer.resolve(location) is None:
+            candidates = gazetteer.suggest(location, CITY_SUGGESTIONS)
+            if candidates and (
+                len(normalize_name(location)) < CITY_UPSTREAM_MIN_LENGTH
+                or not gazetteer.starts_name(location)
+            ):
+                await _answer_suggestions(query, candidates, lang, bot_username, start_time)
+                return
+            if candidates and typing:
+                # A newer keystroke cancels this query during the wait
+                with STAGE_SECONDS.time(stage="debounce"):
+                    await asyncio.sleep(INLINE_DEBOUNCE)
+                typing = False
+            suggestions = candidates
+        elif CITY_MATCH_CARDS > 1:
+            places = gazetteer.matches(location, CITY_MATCH_CARDS, CITY_MATCH_MIN_SHARE)
+            if len(places) > 1:
+                await _answer_matches(query, places, lang, bot_username, typing, start_time)
+                return
         city = location
 
-    weather_data = await fetch_weather_data(city, country_code, lang)
+    if prepared is not None:
+        weather_data, image_url, website_filename = prepared
+    else:
+        try:
+            weather_data = await fetch_weather_data(city, country_code, lang)
+        except WeatherUnavailable:
+            if suggestions:
+                await _answer_suggestions(query, suggestions, lang, bot_username, start_time)
+                return
+            # Nothing cached to fall back on: say so rather than "not found"
+            results = generate_unavailable(lang, bot_username)
+            await _send_answer(query, results, cache_time=1)
+            elapsed_time = time.time() - start_time
+            QUERY_SECONDS.observe(elapsed_time, outcome="upstream_down")
+            logger.warn("Weather unavailable sent")
+            return
     if not weather_data:
-        error_title = "Ошибка определения местоположения" if lang == "ru" else "Location detection error"
-        error_desc = f"Город {location} не найден" if lang == "ru" else f"City {location} not found"
-        error_text = (
-            f"❌ Город <code>{location}</code> не найден\n\n"
-            f"Проверьте название города и попробуйте снова\n\n<b>@{bot_username}</b>"
-            if lang == "ru" else
-            f"❌ City <code>{location}</code> not found\n\n"
-            f"Check the city and try again\n\n<b>@{bot_username}</b>"
-        )
-        results = generate_article(
-            id="city_error",
-            title=error_title,
-            description=error_desc,
-            message_text=error_text,
-        )
-        await query.answer(results, cache_time=1)
-        elapsed_time = time.time() - start_time
-        logger.warn("City error sent")
+        if suggestions:
+            await _answer_suggestions(query, suggestions, lang, bot_username, start_time)
+        else:
+            await _answer_not_found(query, location, lang, bot_username, start_time)
         return
 
-    image_url, website_filename = await generate_image(
-        weather_data=weather_data
-    )
+    if prepared is None:
+        image_url, website_filename = await _card_image(weather_data, typing)
 
     if query.query.strip().lower() == "random":
         if lang == "ru":
@@ -166,35 +253,305 @@ async def _inline_weather_query(query: types.InlineQuery, bot: Bot):
         else:
             title = f"Weather in {weather_data['city']}"
         description = f"{weather_data['temp']:+.1f}°C, {weather_data['description']}"
+    updated = _updated_note(weather_data, lang)
+    results = [_weather_result(
+        weather_data["city"], weather_data, image_url, title, description + updated, updated, bot_username
+    )]
+    if suggestions:
+        results += generate_suggestions(suggestions, lang, bot_username)
+    outcome, cache_time = "ok", 3
+    if weather_data["stale"]:
+        # Served from the stale window while OpenWeatherMap is refreshed
+        outcome, cache_time = "stale", 1
+    if not image_url:
+        # No card: the next query tries it again
+        outcome, cache_time = "text_only", 1
+
+    with STAGE_SECONDS.time(stage="answer"):
+        await _send_answer(query, results, cache_time=cache_time)
+
+    elapsed_time = time.time() - start_time
+    QUERY_SECONDS.observe(elapsed_time, outcome=outcome)
+    if query.query.strip().lower() == "random":
+        logger.info("Random weather processed.")
+    else:
+        logger.info("Query processed")
 
-    result_id = generate_result_id(weather_data["city"], int(time.time()))
-    results = [
-        types.InlineQueryResultPhoto(
+    await cleanup_files(website_filename)
+
+
+async def _answer_matches(
+    query: types.InlineQuery,
+    places: list[City],
+    lang: str,
+    bot_username: str,
+    typing: bool,
+    start_time: float,
+):
+    """One card per city sharing the queried name, rendered as one batch"""
+    location = query.query.strip()
+    fetched = await asyncio.gather(
+        *(fetch_weather_data(location, place.country_code, lang, place) for place in places),
+        return_exceptions=True,
+    )
+    matches = []
+    unavailable = False
+    for place, weather_data in zip(places, fetched):
+        if isinstance(weather_data, WeatherUnavailable):
+            unavailable = True
+        elif isinstance(weather_data, BaseException):
+            raise weather_data
+        elif weather_data:
+            matches.append((place, weather_data))
+
+    if not matches:
+        if not unavailable:
+            await _answer_not_found(query, location, lang, bot_username, start_time)
+            return
+        results = generate_unavailable(lang, bot_username)
+        await _send_answer(query, results, cache_time=1)
+        QUERY_SECONDS.observe(time.time() - start_time, outcome="upstream_down")
+        logger.warn("Weather unavailable sent")
+        return
+
+    image_urls = await _card_images([weather_data for _, weather_data in matches], typing)
+
+    # Places sharing a country as well are told apart by their coordinates
+    countries = [place.country_code for place, _ in matches]
+    results = []
+    cache_time = 3
+    for index, ((place, weather_data), image_url) in enumerate(zip(matches, image_urls)):
+        where = f"{weather_data['city']}, {weather_data['country']}"
+        if countries.count(place.country_code) > 1:
+            where += f" ({abs(place.lat):.1f}°{'NS'[place.lat < 0]} {abs(place.lon):.1f}°{'EW'[place.lon < 0]})"
+        title = f"Погода в {where}" if lang == "ru" else f"Weather in {where}"
+        description = f"{weather_data['temp']:+.1f}°C, {weather_data['description']}"
+        updated = _updated_note(weather_data, lang)
+        results.append(_weather_result(
+            f"{place.id}_{index}",
+            weather_data, image_url, title, description + updated, updated, bot_username,
+        ))
+        if weather_data["stale"] or not image_url:
+            cache_time = 1
+
+    with STAGE_SECONDS.time(stage="answer"):
+        await _send_answer(query, results, cache_time=cache_time)
+
+    QUERY_SECONDS.observe(time.time() - start_time, outcome="multi")
+    logger.info(f"Query processed with {len(results)} cards")
+
+
+async def _answer_suggestions(
+    query: types.InlineQuery, candidates: list[City], lang: str, bot_username: str, start_time: float
+):
+    results = generate_suggestions(candidates, lang, bot_username)
+    await _send_answer(query, results, cache_time=300)
+    elapsed_time = time.time() - start_time
+    QUERY_SECONDS.observe(elapsed_time, outcome="suggestions")
+    logger.debug("City suggestions sent")
+
+
+async def _answer_not_found(
+    query: types.InlineQuery, location: str, lang: str, bot_username: str, start_time: float
+):
+    error_title = "Ошибка определения местоположения" if lang == "ru" else "Location detection error"
+    error_desc = f"Город {location} не найден" if lang == "ru" else f"City {location} not found"
+    error_text = (
+        f"❌ Город <code>{location}</code> не найден\n\n"
+        f"Проверьте название города и попробуйте снова\n\n<b>@{bot_username}</b>"
+        if lang == "ru" else
+        f"❌ City <code>{location}</code> not found\n\n"
+        f"Check the city and try again\n\n<b>@{bot_username}</b>"
+    )
+    results = generate_article(
+        id="city_error",
+        title=error_title,
+        description=error_desc,
+        message_text=error_text,
+    )
+    candidates = gazetteer.close_matches(location, CITY_SUGGESTIONS)
+    if candidates:
+        results = [*results, *generate_suggestions(candidates, lang, bot_username)]
+    await _send_answer(query, results, cache_time=1)
+    elapsed_time = time.time() - start_time
+    QUERY_SECONDS.observe(elapsed_time, outcome="city_error")
+    logger.warn("City error sent")
+
+
+def _updated_note(weather_data: dict, lang: str) -> str:
+    """How old stale weather is, for descriptions and captions"""
+    if not weather_data["stale"]:
+        return ""
+    minutes = weather_data["updated_minutes_ago"]
+    return f" · обновлено {minutes} мин назад" if lang == "ru" else f" · updated {minutes} min ago"
+
+
+def _weather_result(
+    key: str,
+    weather_data: dict,
+    image_url: str | None,
+    title: str,
+    description: str,
+    updated: str,
+    bot_username: str,
+):
+    """A card as a photo result, or the weather as text when there is no card"""
+    if not image_url:
+        # No backend could take the card: answer with the weather as text
+        return generate_article(
+            id=f"{key}_text",
+            title=title,
+            description=description,
+            message_text=generate_weather_text(weather_data, bot_username),
+        )[0]
+
+    result_id = generate_result_id(key, int(time.time()))
+    caption = "<code>{} - {:+.1f}°C, {}{}</code>".format(
+        weather_data["city"],
+        weather_data["temp"],
+        weather_data["description"],
+        updated,
+    )
+    if is_file_id(image_url):
+        # Already on Telegram's servers: nothing is downloaded to show it
+        return types.InlineQueryResultCachedPhoto(
             id=result_id,
-            photo_url=image_url,
-            thumbnail_url=image_url,
+            photo_file_id=image_url,
             title=title,
             description=description,
-            caption="<code>{} - {:+.1f}°C, {}</code>".format(
-                weather_data["city"],
-                weather_data["temp"],
-                weather_data["description"],
-            ),
+            caption=caption,
             parse_mode=ParseMode.HTML,
-            photo_width=1600,
-            photo_height=1000,
         )
-    ]
+    return types.InlineQueryResultPhoto(
+        id=result_id,
+        photo_url=image_url,
+        thumbnail_url=image_url,
+        title=title,
+        description=description,
+        caption=caption,
+        parse_mode=ParseMode.HTML,
+        photo_width=1600,
+        photo_height=1000,
+    )
 
-    await query.answer(results, cache_time=3)
 
-    elapsed_time = time.time() - start_time
-    if query.query.strip().lower() == "random":
-        logger.info("Random weather processed.")
-    else:
-        logger.info("Query processed")
+async def _send_answer(query: types.InlineQuery, results, cache_time: int):
+    # Cancelling a request half-way drops its pooled connection to Telegram,
+    # so a superseded query still finishes an answer it has started sending
+    await asyncio.shield(query.answer(results, cache_time=cache_time))
+
+
+def _normalize_query(city: str, country_code: str | None, lang: str):
+    return " ".join(city.lower().split()), (country_code or "").upper(), lang
 
-    await cleanup_files(website_filename)
+
+async def _get_location(ip: str):
+    return await inline_flight.do(("ip", ip), get_location, ip)
+
+
+async def _card_image(weather_data: dict, typing: bool):
+    """Render and upload a card, waiting briefly first while the user types"""
+    fingerprint = card_fingerprint(weather_data)
+    if typing and fingerprint not in card_cache.local:
+        # A keystroke arriving during the wait cancels this query before
+        # any rendering or uploading is done for it
+        with STAGE_SECONDS.time(stage="debounce"):
+            await asyncio.sleep(INLINE_DEBOUNCE)
+
+    key = fingerprint or _normalize_query(
+        weather_data["city"], weather_data["country"], weather_data["lang"]
+    )
+    return await inline_flight.do(("card", key), generate_image, weather_data)
+
+
+async def _card_images(batch: list[dict], typing: bool) -> list[str | None]:
+    """_card_image() for several cards, rendered and uploaded together"""
+    if typing and any(card_fingerprint(weather_data) not in card_cache.local for weather_data in batch):
+        with STAGE_SECONDS.time(stage="debounce"):
+            await asyncio.sleep(INLINE_DEBOUNCE)
+    return await generate_images(batch)
+
+
+async def _weather_card(city: str, country_code: str | None, lang: str):
+    """Fetch weather and upload its card, shared by identical queries"""
+    try:
+        weather_data = await fetch_weather_data(city, country_code, lang)
+    except WeatherUnavailable:
+        return None, None, None
+    if not weather_data:
+        return None, None, None
+
+    image_url, website_filename = await generate_image(
+        weather_data=weather_data
+    )
+    return weather_data, image_url, website_filename
+
+
+async def _prepare_random(city: str, country_code: str):
+    # `random` is always detected as English
+    prepared = await _weather_card(city, country_code, "en")
+    weather_data, image_url, _ = prepared
+    return prepared if weather_data and image_url else None
+
+
+# Webhook workers each keep a pool but share the ip-api quota
+pool_processes = WEBHOOK_WORKERS if BOT_MODE == "webhook" else 1
+random_pool = RandomLocationPool(
+    size=RANDOM_POOL_SIZE,
+    rate_per_minute=RANDOM_POOL_RATE / max(1, pool_processes),
+    max_age=RANDOM_POOL_MAX_AGE,
+    prepare=_prepare_random if RANDOM_POOL_PREPARE else None,
+)
+
+
+async def _prewarm_card(key: tuple, target: tuple, at: float) -> bool:
+    """Upload the card a popular query will show at `at`, unless it already exists"""
+    cache_key, lang = key
+    _, _, place = target
+    weather_data = cached_weather_data(cache_key, lang, place, at)
+    if weather_data is None:
+        return False
+    fingerprint = card_fingerprint(weather_data)
+    if fingerprint is None or await card_cache.get(fingerprint) is not None:
+        return False
+
+    image_url, _ = await inline_flight.do(("card", fingerprint), generate_image, weather_data)
+    return image_url is not None
+
+
+prewarmer = PrewarmScheduler(
+    weather_popularity,
+    refresh=refresh_weather,
+    prepare=_prewarm_card,
+    top=PREWARM_TOP,
+    cards=PREWARM_CARDS,
+    interval=PREWARM_INTERVAL,
+    min_score=PREWARM_MIN_SCORE,
+)
+
+
+register_stats("weather_inline_flight", inline_flight.stats)
+register_stats("weather_inline_users", user_queries.stats)
+register_stats("weather_gazetteer", gazetteer.stats)
+register_stats("weather_card_cache", card_cache.stats)
+register_stats("weather_random_pool", random_pool.stats)
+register_stats("weather_prewarm", prewarmer.stats)
+
+
+async def start_random_pool():
+    random_pool.start()
+
+
+async def stop_random_pool():
+    await random_pool.stop()
+
+
+async def start_prewarm():
+    prewarmer.start()
+
+
+async def stop_prewarm():
+    await prewarmer.stop()
 
 
 def generate_result_id(city: str, timestamp: float):
@@ -203,25 +560,6 @@ def generate_result_id(city: str, timestamp: float):
     return hashlib.md5(base_string.encode()).hexdigest()[:64]
 
 
-async def upload_to_imgbb(image_io: BytesIO):
-    """Async upload to imgbb"""
-    try:
-        async with httpx.AsyncClient() as client:
-            url = "https://api.imgbb.com/1/upload"
-            response = await client.post(
-                url, data=dict(key=IMGBB_API_KEY), files=dict(image=image_io)
-            )
-            if response.status_code == 200:
-                result = response.json()
-                return result["data"]["url"]
-            else:
-                logger.error("Error from imgbb")
-                return None
-    except Exception as ex:
-        logger.error("Error uploading to imgbb")
-        return None
-
-
 def generate_article(id: str, title: str, description: str, message_text: str):
     result_id = generate_result_id(id, int(time.time()))
     return (
@@ -240,11 +578,81 @@ def generate_article(id: str, title: str, description: str, message_text: str):
     )
 
 
+def generate_unavailable(lang: str, bot_username: str):
+    """Article for when OpenWeatherMap is down and nothing is cached"""
+    return generate_article(
+        id="weather_unavailable",
+        title="Сервис погоды недоступен" if lang == "ru" else "Weather service unavailable",
+        description="Попробуйте через минуту" if lang == "ru" else "Try again in a minute",
+        message_text=(
+            f"⚠️ Сервис погоды временно недоступен, попробуйте через минуту\n\n<b>@{bot_username}</b>"
+            if lang == "ru" else
+            f"⚠️ The weather service is temporarily unavailable, try again in a minute\n\n<b>@{bot_username}</b>"
+        ),
+    )
+
+
+def generate_weather_text(weather_data: dict, bot_username: str) -> str:
+    """The card's contents as a message, for when no card can be sent"""
+    if weather_data["lang"] == "ru":
+        lines = (
+            "🌍 <b>{city}, {country}</b>",
+            "🌡 {temp:+.1f}°C, ощущается как {feels_like:+.1f}°C",
+            "☁️ {description}",
+            "💧 Влажность {humidity}%, давление {pressure} мм рт. ст.",
+            "💨 Ветер {wind_speed} м/с, {wind_dir}",
+            "🌅 Восход {sunrise}, закат {sunset}",
+        )
+    else:
+        lines = (
+            "🌍 <b>{city}, {country}</b>",
+            "🌡 {temp:+.1f}°C, feels like {feels_like:+.1f}°C",
+            "☁️ {description}",
+            "💧 Humidity {humidity}%, pressure {pressure} mmHg",
+            "💨 Wind {wind_speed} m/s, {wind_dir}",
+            "🌅 Sunrise {sunrise}, sunset {sunset}",
+        )
+    return "\n".join(lines).format(**weather_data) + f"\n\n<b>@{bot_username}</b>"
+
+
+def generate_suggestions(cities: list[City], lang: str, bot_username: str):
+    """Articles completing a partial city name, one per candidate"""
+    results = []
+    for city in cities:
+        name = city.name(lang)
+        button_text = "Показать погоду" if lang == "ru" else "Show weather"
+        results.append(
+            types.InlineQueryResultArticle(
+                id=generate_result_id(city.id, int(time.time())),
+                title=f"{name}, {city.country_code}",
+                description=f"@{bot_username} {name}",
+                input_message_content=types.InputTextMessageContent(
+                    message_text=f"🌍 <b>{name}, {city.country_code}</b>\n\n<b>@{bot_username}</b>",
+                    parse_mode=ParseMode.HTML,
+                ),
+                reply_markup=types.InlineKeyboardMarkup(inline_keyboard=[[
+                    types.InlineKeyboardButton(
+                        text=button_text, switch_inline_query_current_chat=name
+                    )
+                ]]),
+            )
+        )
+    return results
+
+
 async def generate_image(weather_data: dict):
     timestamp = int(time.time())
-    local_filename = generate_random_filename(prefix=f"weather_{timestamp}")
+    local_filename = generate_random_filename(
+        prefix=f"weather_{timestamp}", extension=CARD_EXTENSIONS[CARD_FORMAT]
+    )
     website_filename = local_filename
 
+    fingerprint = card_fingerprint(weather_data)
+    cached_url = await card_cache.get(fingerprint) if fingerprint else None
+    if cached_url:
+        logger.debug("Cached card used")
+        return cached_url, website_filename
+
     card_created, card_io = await create_weather_card_async(weather_data)
 
     if not card_created:
@@ -252,13 +660,56 @@ async def generate_image(weather_data: dict):
     elif card_io is None:
         raise RuntimeError("Didn't created card's BytesIO!")
 
-    imgbb_task = asyncio.create_task(upload_to_imgbb(card_io))
-
-    image_url = await imgbb_task
+    image_url = await card_uploader.upload(card_io, local_filename)
+    if image_url and fingerprint:
+        card_cache.set(fingerprint, image_url)
 
     return image_url, website_filename
 
 
+async def generate_images(batch: list[dict]) -> list[str | None]:
+    """Card references for several weather_data dicts, None where upload failed.
+
+    Cards not in card_cache are rendered in one executor submission and
+    uploaded concurrently; identical cards are uploaded once.
+    """
+    image_urls: list[str | None] = [None] * len(batch)
+    fingerprints = [card_fingerprint(weather_data) for weather_data in batch]
+    missing: dict = {}
+    for index, fingerprint in enumerate(fingerprints):
+        cached_url = await card_cache.get(fingerprint) if fingerprint else None
+        if cached_url:
+            image_urls[index] = cached_url
+        else:
+            missing.setdefault(fingerprint or index, []).append(index)
+    if not missing:
+        logger.debug("Cached cards used")
+        return image_urls
+
+    groups = list(missing.values())
+    cards = await create_weather_cards_async([batch[group[0]] for group in groups])
+    uploaded = await asyncio.gather(*(
+        _upload_card(card_io, fingerprints[group[0]])
+        for group, card_io in zip(groups, cards)
+    ))
+    for group, image_url in zip(groups, uploaded):
+        for index in group:
+            image_urls[index] = image_url
+    return image_urls
+
+
+async def _upload_card(card_io, fingerprint: str | None) -> str | None:
+    if card_io is None:
+        return None
+    filename = generate_random_filename(
+        prefix=f"weather_{int(time.time())}", extension=CARD_EXTENSIONS[CARD_FORMAT]
+    )
+    image_url = await card_uploader.upload(card_io, filename)
+    if image_url and fingerprint:
+        card_cache.set(fingerprint, image_url)
+    return image_url
+
+
 HELP_MESSAGE_EN = (
     "🌤️ <b>Weather Bot</b>\n\n"
     "To check the weather, type:\n"
@@ -0,0 +1,395 @@
+"""Local stand-ins for the services the bot talks to.
+
+Each fake is a small aiohttp app with configurable latency and error
+injection, so the whole inline pipeline can run against localhost:
+
+- Telegram Bot API: getMe, answerInlineQuery and sendPhoto, other methods return ok;
+  photo URLs in answers are fetched like Telegram does, revalidating repeats
+- OpenWeatherMap: /data/2.5/weather and /data/2.5/group
+- ip-api: /json/{ip}
+- imgbb: /1/upload plus the uploaded images themselves
+- Redis: GET/SET/DEL/PING over RESP, for CACHE_BACKEND=redis
+"""
+
+import json
+import random
+import asyncio
+import hashlib
+import time
+from abc import ABC, abstractmethod
+from collections import Counter
+from typing import Dict, List
+
+from aiohttp import ClientError, ClientSession, web
+
+
+class FaultProfile:
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0):
+        self.latency = latency  # mean seconds per request
+        self.jitter = jitter  # standard deviation of the latency
+        self.error_rate = error_rate  # share of requests answered with HTTP 500
+
+    async def apply(self) -> bool:
+        """Sleep for the simulated latency; True if this request should fail"""
+        delay = random.gauss(self.latency, self.jitter) if self.jitter else self.latency
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return random.random() < self.error_rate
+
+
+class FakeService(ABC):
+    def __init__(self, name: str, faults: FaultProfile):
+        self.name = name
+        self.faults = faults
+        self.requests: Counter = Counter()
+        self.runner: web.AppRunner | None = None
+        self.base_url = ""
+
+    @abstractmethod
+    def app(self) -> web.Application:
+        """The aiohttp app serving this fake's endpoints"""
+
+    async def start(self, host: str = "127.0.0.1"):
+        self.runner = web.AppRunner(self.app(), access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, host, 0).start()
+        port = self.runner.addresses[0][1]
+        self.base_url = f"http://{host}:{port}"
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+
+    async def _faulty(self, endpoint: str) -> web.Response | None:
+        self.requests[endpoint] += 1
+        if await self.faults.apply():
+            self.requests[f"{endpoint}:error"] += 1
+            return web.json_response({"error": "injected"}, status=500)
+        return None
+
+
+class FakeTelegram(FakeService):
+    def __init__(self, faults: FaultProfile):
+        super().__init__("telegram", faults)
+        self.answers: List[dict] = []
+        self.answered_at: Dict[str, float] = {}
+        self.photos: Dict[str, int] = {}  # file_id -> size of the photos sent with sendPhoto
+        self.uploaded_bytes = 0
+        self.fetches: Counter = Counter()  # HTTP status of each photo_url fetch
+        self._etags: Dict[str, str] = {}
+        self._fetching: set = set()
+        self._session: ClientSession | None = None
+
+    async def drain(self):
+        """Wait for photo fetches still in progress"""
+        if self._fetching:
+            await asyncio.gather(*self._fetching, return_exceptions=True)
+
+    async def stop(self):
+        await self.drain()
+        if self._session is not None:
+            await self._session.close()
+        await super().stop()
+
+    async def _fetch_photo(self, url: str):
+        if self._session is None:
+            self._session = ClientSession()
+        headers = {"If-None-Match": self._etags[url]} if url in self._etags else {}
+        try:
+            async with self._session.get(url, headers=headers) as response:
+                await response.read()
+                if "ETag" in response.headers:
+                    self._etags[url] = response.headers["ETag"]
+                self.fetches[response.status] += 1
+        except ClientError:
+            self.fetches["error"] += 1
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=16 * 1024 * 1024)
+        app.router.add_post("/bot{token}/{method}", self.handle)
+        return app
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        failure = await self._faulty(method)
+        if failure is not None:
+            return web.json_response(
+                {"ok": False, "error_code": 500, "description": "Injected error"},
+                status=500,
+            )
+
+        if method == "getMe":
+            return web.json_response({"ok": True, "result": {
+                "id": 1,
+                "is_bot": True,
+                "first_name": "Weather",
+                "username": "loadtest_weather_bot",
+            }})
+
+        if method == "answerInlineQuery":
+            try:
+                form = await request.post()
+            except ConnectionResetError:
+                self.requests[f"{method}:aborted"] += 1
+                return web.Response(status=499)
+            results = json.loads(form.get("results", "[]"))
+            self.answers.append({
+                "inline_query_id": form.get("inline_query_id"),
+                "types": [
+                    result.get("type") + (":cached" if "photo_file_id" in result else "")
+                    for result in results
+                ],
+            })
+            self.answered_at[str(form.get("inline_query_id"))] = time.perf_counter()
+            for result in results:
+                if "photo_url" in result:
+                    task = asyncio.create_task(self._fetch_photo(result["photo_url"]))
+                    self._fetching.add(task)
+                    task.add_done_callback(self._fetching.discard)
+
+        if method == "sendPhoto":
+            form = await request.post()
+            photo = form["photo"]
+            if isinstance(photo, str) and photo.startswith("attach://"):
+                photo = form[photo[len("attach://"):]]
+            data = photo.file.read()
+            file_id = "photo-" + hashlib.sha256(data).hexdigest()[:24]
+            self.photos[file_id] = len(data)
+            self.uploaded_bytes += len(data)
+            return web.json_response({"ok": True, "result": {
+                "message_id": len(self.photos),
+                "date": int(time.time()),
+                "chat": {"id": int(form.get("chat_id", 0)), "type": "channel"},
+                "photo": [{
+                    "file_id": file_id,
+                    "file_unique_id": file_id[-12:],
+                    "width": 1280,
+                    "height": 800,
+                    "file_size": len(data),
+                }],
+            }})
+
+        return web.json_response({"ok": True, "result": True})
+
+
+def _city_weather(city: str) -> dict:
+    seed = int(hashlib.md5(city.lower().encode()).hexdigest()[:8], 16)
+    rng = random.Random(seed)
+    midnight = int(time.time()) // 86400 * 86400
+    return {
+        "cod": 200,
+        "id": seed % 10_000_000,
+        "name": city.strip().title(),
+        "coord": {"lat": rng.uniform(-60, 70), "lon": rng.uniform(-180, 180)},
+        "main": {
+            "temp": round(rng.uniform(-30, 40), 2),
+            "feels_like": round(rng.uniform(-35, 42), 2),
+            "humidity": rng.randint(10, 100),
+            "pressure": rng.randint(980, 1040),
+        },
+        "weather": [rng.choice([
+            {"id": 800, "description": "clear sky"},
+            {"id": 801, "description": "few clouds"},
+            {"id": 804, "description": "overcast clouds"},
+            {"id": 500, "description": "light rain"},
+            {"id": 601, "description": "snow"},
+            {"id": 701, "description": "mist"},
+        ])],
+        "wind": {"speed": round(rng.uniform(0, 15), 1), "deg": rng.randint(0, 359)},
+        "sys": {"country": "XX", "sunrise": midnight + 21600, "sunset": midnight + 64800},
+        "timezone": rng.choice([-18000, 0, 3600, 10800, 32400]),
+    }
+
+
+class FakeOpenWeatherMap(FakeService):
+    """Known cities are any name of three or more letters"""
+
+    def __init__(self, faults: FaultProfile):
+        super().__init__("openweathermap", faults)
+        self.names: Dict[int, str] = {}  # city ids handed out, for the group endpoint
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/data/2.5/weather", self.weather)
+        app.router.add_get("/data/2.5/group", self.group)
+        app.router.add_get("/geo/1.0/direct", self.geocode)
+        return app
+
+    async def weather(self, request: web.Request) -> web.Response:
+        failure = await self._faulty("weather")
+        if failure is not None:
+            return failure
+
+        query = request.query.get("q")
+        if query is None and "lat" in request.query:
+            query = f"{request.query['lat']},{request.query['lon']}"
+        city = (query or "").split(",")[0]
+        if len(city.strip()) < 3:
+            return web.json_response({"cod": "404", "message": "city not found"}, status=404)
+        data = _city_weather(city)
+        self.names[data["id"]] = city
+        return web.json_response(data)
+
+    async def group(self, request: web.Request) -> web.Response:
+        failure = await self._faulty("group")
+        if failure is not None:
+            return failure
+
+        ids = [int(city_id) for city_id in request.query.get("id", "").split(",") if city_id]
+        items = []
+        for city_id in ids:
+            item = _city_weather(self.names.get(city_id, f"city-{city_id}"))
+            item["id"] = city_id
+            del item["cod"]
+            items.append(item)
+        return web.json_response({"cnt": len(items), "list": items})
+
+
+    async def geocode(self, request: web.Request) -> web.Response:
+        failure = await self._faulty("geocode")
+        if failure is not None:
+            return failure
+
+        city = request.query.get("q", "").split(",")[0]
+        if len(city.strip()) < 3:
+            return web.json_response([])
+        data = _city_weather(city)
+        name = data["name"]
+        return web.json_response([{
+            "name": name,
+            "local_names": {"en": name, "ru": f"{name} (ru)"},
+            "lat": data["coord"]["lat"],
+            "lon": data["coord"]["lon"],
+            "country": data["sys"]["country"],
+        }])
+
+
+class FakeIpApi(FakeService):
+    def __init__(self, faults: FaultProfile, success_rate: float = 0.7):
+        super().__init__("ip-api", faults)
+        self.success_rate = success_rate
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/json/{ip}", self.lookup)
+        return app
+
+    async def lookup(self, request: web.Request) -> web.Response:
+        failure = await self._faulty("json")
+        if failure is not None:
+            return failure
+
+        ip = request.match_info["ip"]
+        rng = random.Random(ip.rsplit(".", 1)[0])
+        if rng.random() > self.success_rate:
+            return web.json_response({"status": "fail", "message": "reserved range"})
+        return web.json_response({
+            "status": "success",
+            "city": f"City {ip.split('.')[0]}",
+            "countryCode": "XX",
+        })
+
+
+class FakeImgbb(FakeService):
+    def __init__(self, faults: FaultProfile):
+        super().__init__("imgbb", faults)
+        self.images: Dict[str, bytes] = {}
+        self.uploaded_bytes = 0
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=16 * 1024 * 1024)
+        app.router.add_post("/1/upload", self.upload)
+        app.router.add_get("/i/{name}", self.image)
+        return app
+
+    async def upload(self, request: web.Request) -> web.Response:
+        form = await request.post()
+        failure = await self._faulty("upload")
+        if failure is not None:
+            return failure
+
+        image = form["image"]
+        data = image.file.read() if hasattr(image, "file") else bytes(image, "latin-1")
+        digest = hashlib.sha256(data).hexdigest()[:16]
+        self.images[digest] = data
+        self.uploaded_bytes += len(data)
+        return web.json_response({"data": {"url": f"{self.base_url}/i/{digest}.png"}})
+
+    async def image(self, request: web.Request) -> web.Response:
+        digest = request.match_info["name"].split(".")[0]
+        data = self.images.get(digest)
+        if data is None:
+            raise web.HTTPNotFound()
+        return web.Response(body=data, content_type="image/png")
+
+
+class FakeRedis:
+    """In-memory RESP server with just the commands the cache backend uses"""
+
+    def __init__(self, faults: FaultProfile):
+        self.name = "redis"
+        self.faults = faults
+        self.requests: Counter = Counter()
+        self.data: Dict[bytes, tuple] = {}
+        self.server: asyncio.AbstractServer | None = None
+        self.base_url = ""
+
+    async def start(self, host: str = "127.0.0.1"):
+        self.server = await asyncio.start_server(self.serve, host, 0)
+        port = self.server.sockets[0].getsockname()[1]
+        self.base_url = f"redis://{host}:{port}/0"
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+    async def _read_command(self, reader: asyncio.StreamReader) -> List[bytes] | None:
+        header = await reader.readline()
+        if not header.startswith(b"*"):
+            return None
+        args = []
+        for _ in range(int(header[1:])):
+            length = int((await reader.readline())[1:])
+            args.append((await reader.readexactly(length + 2))[:-2])
+        return args
+
+    def _execute(self, args: List[bytes]) -> bytes:
+        command = args[0].upper().decode()
+        self.requests[command] += 1
+        if command in ("PING", "AUTH", "SELECT"):
+            return b"+PONG\r\n" if command == "PING" else b"+OK\r\n"
+        if command == "GET":
+            value, expires_at = self.data.get(args[1], (None, 0))
+            if value is None or (expires_at and expires_at <= time.monotonic()):
+                return b"$-1\r\n"
+            return b"$%d\r\n%s\r\n" % (len(value), value)
+        if command == "SET":
+            expires_at = 0
+            if len(args) >= 5 and args[3].upper() == b"PX":
+                expires_at = time.monotonic() + int(args[4]) / 1000
+            elif len(args) >= 5 and args[3].upper() == b"EX":
+                expires_at = time.monotonic() + int(args[4])
+            self.data[args[1]] = (args[2], expires_at)
+            return b"+OK\r\n"
+        if command == "DEL":
+            removed = sum(self.data.pop(key, None) is not None for key in args[1:])
+            return b":%d\r\n" % removed
+        return b"-ERR unknown command\r\n"
+
+    async def serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                args = await self._read_command(reader)
+                if args is None:
+                    break
+                if await self.faults.apply():
+                    self.requests["error"] += 1
+                    writer.write(b"-ERR injected\r\n")
+                else:
+                    writer.write(self._execute(args))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
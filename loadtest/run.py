@@ -0,0 +1,261 @@
+"""End-to-end load test of the inline query pipeline.
+
+Starts local fakes for Telegram, OpenWeatherMap, ip-api and imgbb, points
+the bot at them, feeds synthetic inline query updates through the real
+aiogram dispatcher and reports throughput and latency percentiles.
+
+    python loadtest/run.py --queries 500 --concurrency 20
+    python loadtest/run.py --duration 60 --owm-latency 0.2 --owm-errors 0.05
+"""
+
+import os
+import sys
+import time
+import random
+import asyncio
+import logging
+import argparse
+import statistics
+from collections import Counter
+from typing import Dict, Iterator, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(ROOT)
+sys.path.insert(0, ROOT)
+
+from loadtest.fakes import (  # noqa: E402
+    FakeImgbb,
+    FakeIpApi,
+    FakeOpenWeatherMap,
+    FakeRedis,
+    FakeTelegram,
+    FaultProfile,
+)
+
+
+CITIES = (
+    "Moscow", "London", "Paris", "Berlin", "Tokyo", "New York", "Madrid",
+    "Rome", "Kyiv", "Warsaw", "Prague", "Vienna", "Istanbul", "Dubai",
+    "Seoul", "Sydney", "Toronto", "Chicago", "Lisbon", "Oslo", "Helsinki",
+    "Almaty", "Tbilisi", "Yerevan", "Minsk", "Riga", "Vilnius", "Tallinn",
+    "Москва", "Санкт-Петербург", "Новосибирск", "Казань",
+)
+
+# Names shared by several gazetteer cities, answered with one card each
+AMBIGUOUS_CITIES = ("Springfield", "Portland", "Birmingham", "Vancouver")
+
+# Share of each query kind in the generated mix
+DEFAULT_MIX = {"city": 0.55, "ambiguous": 0.05, "prefix": 0.25, "random": 0.1, "ip": 0.05}
+
+
+def zipf_choice(rng: random.Random, items: Tuple[str, ...], s: float = 1.1) -> str:
+    """Popular cities are asked for far more often than the tail"""
+    weights = [1 / (rank ** s) for rank in range(1, len(items) + 1)]
+    return rng.choices(items, weights=weights)[0]
+
+
+def generate_queries(
+    rng: random.Random, mix: Dict[str, float], users: int, keystroke_delay: float
+) -> Iterator[Tuple[int, str, str, float]]:
+    """Yield (user_id, kind, query, delay) forever; delay is when the query is sent"""
+    kinds, weights = zip(*mix.items())
+    while True:
+        user_id = rng.randint(1, users)
+        kind = rng.choices(kinds, weights=weights)[0]
+        if kind == "city":
+            yield user_id, kind, zipf_choice(rng, CITIES), 0
+        elif kind == "ambiguous":
+            yield user_id, kind, rng.choice(AMBIGUOUS_CITIES), 0
+        elif kind == "prefix":
+            # Someone typing a city name; Telegram sends every keystroke
+            city = zipf_choice(rng, CITIES)
+            for length in range(1, len(city) + 1):
+                yield user_id, kind, city[:length], (length - 1) * keystroke_delay
+        elif kind == "random":
+            yield user_id, kind, "random", 0
+        else:
+            yield user_id, kind, ".".join(str(rng.randint(1, 223)) for _ in range(4)), 0
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def format_latencies(values: List[float]) -> str:
+    return (
+        f"n={len(values):<6} "
+        f"p50 {percentile(values, 50) * 1000:8.1f} ms  "
+        f"p90 {percentile(values, 90) * 1000:8.1f} ms  "
+        f"p99 {percentile(values, 99) * 1000:8.1f} ms  "
+        f"max {max(values, default=0) * 1000:8.1f} ms"
+    )
+
+
+async def start_fakes(args) -> Dict[str, object]:
+    fakes = {
+        "telegram": FakeTelegram(FaultProfile(args.tg_latency, args.jitter, args.tg_errors)),
+        "openweathermap": FakeOpenWeatherMap(FaultProfile(args.owm_latency, args.jitter, args.owm_errors)),
+        "ip-api": FakeIpApi(FaultProfile(args.ip_latency, args.jitter, args.ip_errors)),
+        "imgbb": FakeImgbb(FaultProfile(args.imgbb_latency, args.jitter, args.imgbb_errors)),
+    }
+    if args.cache_backend == "redis":
+        fakes["redis"] = FakeRedis(FaultProfile(args.redis_latency, args.jitter, args.redis_errors))
+    for fake in fakes.values():
+        await fake.start()
+
+    # config.py reads these at import time, so the bot is imported afterwards
+    os.environ["OPENWEATHERMAP_BASE_URL"] = fakes["openweathermap"].base_url
+    os.environ["IP_API_BASE_URL"] = fakes["ip-api"].base_url
+    os.environ["IMGBB_BASE_URL"] = fakes["imgbb"].base_url
+    os.environ["CACHE_BACKEND"] = args.cache_backend
+    os.environ["CARD_UPLOAD"] = args.card_upload
+    os.environ["STORAGE_CHAT_ID"] = "-1001"
+    os.environ["IMAGE_SERVER_HOST"] = "127.0.0.1"
+    os.environ["IMAGE_SERVER_PORT"] = str(args.image_port)
+    os.environ["IMAGE_PUBLIC_URL"] = f"http://127.0.0.1:{args.image_port}"
+    if "redis" in fakes:
+        os.environ["REDIS_URL"] = fakes["redis"].base_url
+    for var in ("BOT_TOKEN", "OPENWEATHERMAP_API_KEY", "IMGBB_API_KEY"):
+        os.environ[var] = "123456:loadtest"
+    return fakes
+
+
+async def run(args):
+    fakes = await start_fakes(args)
+
+    from aiogram import Bot, Dispatcher, types
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.client.telegram import TelegramAPIServer
+
+    from main import setup_dispatcher
+
+    session = AiohttpSession(api=TelegramAPIServer.from_base(fakes["telegram"].base_url))
+    bot = Bot(token=os.environ["BOT_TOKEN"], session=session)
+    dp = Dispatcher()
+    setup_dispatcher(dp)
+    await dp.emit_startup(bot=bot)
+
+    rng = random.Random(args.seed)
+    queries = generate_queries(rng, DEFAULT_MIX, args.users, args.keystroke_delay)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies: Dict[str, List[float]] = {}
+    failures = Counter()
+
+    async def feed(update_id: int, user_id: int, kind: str, text: str, delay: float):
+        await asyncio.sleep(delay)
+        update = types.Update.model_validate({
+            "update_id": update_id,
+            "inline_query": {
+                "id": str(update_id),
+                "from": {"id": user_id, "is_bot": False, "first_name": "Load"},
+                "query": text,
+                "offset": "",
+            },
+        }, context={"bot": bot})
+
+        start_time = time.perf_counter()
+        try:
+            await dp.feed_update(bot, update)
+        except Exception as ex:
+            failures[type(ex).__name__] += 1
+        finally:
+            latencies.setdefault(kind, []).append(time.perf_counter() - start_time)
+            semaphore.release()
+
+    tasks = set()
+    started_at = time.perf_counter()
+    deadline = started_at + args.duration if args.duration else None
+    update_id = 0
+    try:
+        while True:
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            if deadline is None and update_id >= args.queries:
+                break
+
+            await semaphore.acquire()
+            user_id, kind, text, delay = next(queries)
+            update_id += 1
+            task = asyncio.create_task(feed(update_id, user_id, kind, text, delay))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        if tasks:
+            await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started_at
+    finally:
+        await fakes["telegram"].drain()
+        await dp.emit_shutdown(bot=bot)
+        await bot.session.close()
+        for fake in fakes.values():
+            await fake.stop()
+
+    report(args, fakes, latencies, failures, update_id, elapsed)
+
+
+def report(args, fakes, latencies, failures, total: int, elapsed: float):
+    print(f"{total} queries in {elapsed:.1f} s at concurrency {args.concurrency}: "
+          f"{total / elapsed:.1f} queries/s")
+
+    print("\nLatency (dispatcher entry to handler return)")
+    every = [value for values in latencies.values() for value in values]
+    print(f"  {'all':<8} {format_latencies(every)}")
+    for kind in sorted(latencies):
+        print(f"  {kind:<8} {format_latencies(latencies[kind])}")
+
+    answers = fakes["telegram"].answers
+    result_types = Counter(",".join(answer["types"]) or "empty" for answer in answers)
+    print(f"\nAnswers sent: {len(answers)} ({total - len(answers)} queries superseded or failed)")
+    for result_type, count in result_types.most_common():
+        print(f"  {result_type:<12} {count}")
+    if failures:
+        print("Handler exceptions:")
+        for name, count in failures.most_common():
+            print(f"  {name:<24} {count}")
+
+    print("\nUpstream requests")
+    for name, fake in fakes.items():
+        counts = ", ".join(f"{endpoint}={count}" for endpoint, count in sorted(fake.requests.items()))
+        print(f"  {name:<15} {counts or '-'}")
+    telegram = fakes["telegram"]
+    if telegram.photos:
+        print(f"  telegram stored {len(telegram.photos)} cards, {telegram.uploaded_bytes} B uploaded")
+    if telegram.fetches:
+        statuses = ", ".join(f"{status}={count}" for status, count in sorted(telegram.fetches.items(), key=str))
+        print(f"  telegram fetched photo URLs: {statuses}")
+    imgbb = fakes["imgbb"]
+    if imgbb.images:
+        sizes = [len(data) for data in imgbb.images.values()]
+        print(f"  imgbb stored {len(sizes)} cards, {imgbb.uploaded_bytes} B uploaded, "
+              f"median {int(statistics.median(sizes))} B")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--queries", type=int, default=200, help="number of queries to send")
+    parser.add_argument("--duration", type=float, default=0, help="run for N seconds instead")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--keystroke-delay", type=float, default=0.15, help="seconds between typed prefixes")
+    parser.add_argument("--log-level", default="WARNING", help="bot log level during the run")
+    parser.add_argument("--jitter", type=float, default=0.0, help="latency std deviation, seconds")
+    parser.add_argument("--cache-backend", default="memory", choices=("memory", "shm", "redis"))
+    parser.add_argument("--card-upload", default="imgbb", choices=("imgbb", "telegram", "local"))
+    parser.add_argument("--image-port", type=int, default=18090, help="built-in image server port")
+    for service, latency in (("tg", 0.03), ("owm", 0.1), ("ip", 0.05), ("imgbb", 0.3), ("redis", 0.0)):
+        parser.add_argument(f"--{service}-latency", type=float, default=latency)
+        parser.add_argument(f"--{service}-errors", type=float, default=0.0, help="error rate, 0-1")
+    args = parser.parse_args()
+
+    logging.getLogger("utils.logger").setLevel(args.log_level.upper())
+    logging.getLogger("aiogram").setLevel(args.log_level.upper())
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,80 @@
 import asyncio
 from aiogram import Bot, Dispatcher
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 
-from config import BOT_TOKEN
+from config import (
+    BOT_MODE,
+    BOT_TOKEN,
+    TELEGRAM_API_URL,
+    WEBHOOK_HOST,
+    WEBHOOK_PORT,
+    WEBHOOK_WORKERS,
+)
 from handlers.user_handlers import router as common_router
 from handlers.inline import rt as inline_router
+from handlers.inline import start_prewarm, start_random_pool, stop_prewarm, stop_random_pool
+from utils.cache_backend import start_cache_backend, stop_cache_backend
+from utils.gazetteer import start_gazetteer
+from utils.geo import start_geo_database
+from utils.http import start_http_clients, close_http_clients
 from utils.logger import logger
+from utils.metrics import start_metrics_server, stop_metrics_server
+from utils.render_pool import start_render_executor, stop_render_executor
+from utils.upload import start_card_uploader, stop_card_uploader
+from utils.weather import start_weather_cache
+from utils.webhook import WORKER_HOST, run_webhook_router, serve_webhook, set_webhook, worker_port
 
-bot = Bot(token=BOT_TOKEN)
+session = AiohttpSession(api=TelegramAPIServer.from_base(TELEGRAM_API_URL)) if TELEGRAM_API_URL else None
+bot = Bot(token=BOT_TOKEN, session=session)
 dp = Dispatcher()
 
 
-async def main():
+def setup_dispatcher(dp: Dispatcher):
     dp.include_router(common_router)
     dp.include_router(inline_router)
+
+    dp.startup.register(start_http_clients)
+    dp.startup.register(start_render_executor)
+    dp.startup.register(start_cache_backend)
+    dp.startup.register(start_card_uploader)
+    dp.startup.register(start_weather_cache)
+    dp.startup.register(start_geo_database)
+    dp.startup.register(start_gazetteer)
+    dp.startup.register(start_random_pool)
+    dp.startup.register(start_prewarm)
+    dp.startup.register(start_metrics_server)
+    dp.shutdown.register(stop_random_pool)
+    dp.shutdown.register(stop_prewarm)
+    dp.shutdown.register(stop_metrics_server)
+    dp.shutdown.register(close_http_clients)
+    dp.shutdown.register(stop_render_executor)
+    dp.shutdown.register(stop_card_uploader)
+    dp.shutdown.register(stop_cache_backend)
+
+
+def run_webhook_worker(index: int):
+    """Entry point of a webhook worker process"""
+    setup_dispatcher(dp)
+    try:
+        asyncio.run(serve_webhook(dp, bot, WORKER_HOST, worker_port(index)))
+    except KeyboardInterrupt:
+        pass
+
+
+async def main():
+    setup_dispatcher(dp)
     
     logger.info("Bot started!")
-    await dp.start_polling(bot)
+    if BOT_MODE == "webhook" and WEBHOOK_WORKERS > 1:
+        await run_webhook_router(bot, dp, run_webhook_worker, WEBHOOK_WORKERS)
+    elif BOT_MODE == "webhook":
+        dp.startup.register(set_webhook)
+        await serve_webhook(dp, bot, WEBHOOK_HOST, WEBHOOK_PORT)
+    else:
+        # getUpdates is refused while a webhook is set
+        await bot.delete_webhook()
+        await dp.start_polling(bot)
 
 
 if __name__ == "__main__":
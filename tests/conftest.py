@@ -0,0 +1,6 @@
+import os
+
+# config refuses to load without credentials; tests never reach the services
+os.environ.setdefault("BOT_TOKEN", "1:test")
+os.environ.setdefault("OPENWEATHERMAP_API_KEY", "test")
+os.environ.setdefault("IMGBB_API_KEY", "test")
@@ -0,0 +1,24 @@
+from utils.gazetteer import Gazetteer
+
+
+def load(tmp_path):
+    path = tmp_path / "cities.tsv"
+    path.write_text(
+        "MX:mexico-city\tMX\tMexico City\tМехико\t19.43\t-99.13\t9200000\n"
+        "RU:moscow\tRU\tMoscow\tМосква\t55.75\t37.62\t12600000\n"
+        "US:moscow-id\tUS\tMoscow\tМосква\t46.73\t-117.00\t26000\n",
+        encoding="utf-8",
+    )
+    gazetteer = Gazetteer()
+    gazetteer.load(str(path))
+    return gazetteer
+
+
+def test_only_whole_words_start_a_name(tmp_path):
+    gazetteer = load(tmp_path)
+    assert gazetteer.starts_name("mexico")
+    assert gazetteer.starts_name("Mexico ")
+    assert not gazetteer.starts_name("Mexi")
+    assert not gazetteer.starts_name("Mexico City")
+    assert not gazetteer.starts_name("Mosc")
+
@@ -0,0 +1,57 @@
+import asyncio
+
+from utils.singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    async def scenario():
+        flight = SingleFlight("test")
+        calls = 0
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return calls
+
+        results = await asyncio.gather(*(flight.do("key", work) for _ in range(3)))
+        return results, calls, flight.stats()
+
+    results, calls, stats = asyncio.run(scenario())
+    assert results == [1, 1, 1]
+    assert calls == 1
+    assert stats["leaders"] == 1 and stats["merged"] == 2
+
+
+def test_caller_after_last_waiter_leaves_starts_a_new_call():
+    async def scenario():
+        flight = SingleFlight("test")
+        started = []
+
+        async def work(n):
+            started.append(n)
+            try:
+                await asyncio.sleep(0.05)
+            except asyncio.CancelledError:
+                # Cancellation takes a moment, as with a call cleaning up
+                await asyncio.sleep(0.01)
+                raise
+            return n
+
+        first = asyncio.create_task(flight.do("key", work, 1))
+        await asyncio.sleep(0)
+        first.cancel()
+        # Arrives while the abandoned call is still being cancelled
+        second = asyncio.create_task(flight.do("key", work, 2))
+        result = await second
+        try:
+            await first
+        except asyncio.CancelledError:
+            pass
+        return result, started, flight.stats()
+
+    result, started, stats = asyncio.run(scenario())
+    assert result == 2
+    assert started == [1, 2]
+    assert stats["abandoned"] == 1
+    assert stats["in_flight"] == 0
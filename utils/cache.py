@@ -0,0 +1,154 @@
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+def approx_size(value: Any) -> int:
+    """Shallow size of a value plus its direct members, in bytes"""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        members = [*value.keys(), *value.values()]
+    elif isinstance(value, (tuple, list)):
+        members = value
+    elif hasattr(value, "__slots__"):
+        members = [getattr(value, name, None) for name in value.__slots__]
+    else:
+        members = ()
+    return size + sum(sys.getsizeof(member) for member in members)
+
+
+class CacheEntry:
+    __slots__ = ("value", "expires_at", "size")
+
+    def __init__(self, value: Any, expires_at: float, size: int):
+        self.value = value
+        self.expires_at = expires_at
+        self.size = size
+
+
+class TTLCache:
+    """LRU cache whose entries also expire after a fixed time-to-live.
+
+    Entries are kept in two orders: recency for LRU eviction, and insertion
+    order, which is also expiry order because every entry shares one TTL.
+    Both evictions therefore pop from the front of an OrderedDict in O(1).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        ttl: float,
+        max_entries: int,
+        max_bytes: int = 0,
+        sizeof: Callable[[Any], int] = approx_size,
+    ):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.bytes = 0
+        self._lru: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+        self._expiry: "OrderedDict[Hashable, None]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._lru)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, count=False) is not None
+
+    def get(self, key: Hashable, count: bool = True) -> Optional[Any]:
+        entry = self._lru.get(key)
+        if entry is not None:
+            if time.monotonic() < entry.expires_at:
+                self._lru.move_to_end(key)
+                if count:
+                    self.hits += 1
+                return entry.value
+            self._remove(key)
+            self.expirations += 1
+
+        if count:
+            self.misses += 1
+        return None
+
+    def expires_in(self, key: Hashable) -> Optional[float]:
+        """Seconds until key expires, None if it is not cached"""
+        entry = self._lru.get(key)
+        if entry is None:
+            return None
+        remaining = entry.expires_at - time.monotonic()
+        return remaining if remaining > 0 else None
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None):
+        """Store a value; ttl may only shorten the cache's own TTL.
+
+        Shorter per-entry TTLs (e.g. entries restored from disk) can sit
+        behind longer-lived ones in expiry order; they are still never
+        returned once expired, only purged a little later.
+        """
+        if key in self._lru:
+            self._remove(key)
+
+        now = time.monotonic()
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        size = self.sizeof(key) + self.sizeof(value)
+        self._lru[key] = CacheEntry(value, now + ttl, size)
+        self._expiry[key] = None
+        self.bytes += size
+
+        self.purge_expired(now)
+        while len(self._lru) > self.max_entries or (
+            self.max_bytes and self.bytes > self.max_bytes and len(self._lru) > 1
+        ):
+            self._remove(next(iter(self._lru)))
+            self.evictions += 1
+
+    def pop(self, key: Hashable) -> Optional[Any]:
+        if key not in self._lru:
+            return None
+        return self._remove(key).value
+
+    def purge_expired(self, now: float | None = None) -> int:
+        now = time.monotonic() if now is None else now
+        purged = 0
+        while self._expiry:
+            key = next(iter(self._expiry))
+            if self._lru[key].expires_at > now:
+                break
+            self._remove(key)
+            purged += 1
+        self.expirations += purged
+        return purged
+
+    def clear(self):
+        self._lru.clear()
+        self._expiry.clear()
+        self.bytes = 0
+
+    def _remove(self, key: Hashable) -> CacheEntry:
+        entry = self._lru.pop(key)
+        del self._expiry[key]
+        self.bytes -= entry.size
+        return entry
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._lru),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": round(self.hit_rate, 4),
+        }
@@ -0,0 +1,372 @@
+import json
+import time
+import asyncio
+import sqlite3
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from config import (
+    CACHE_BACKEND,
+    CACHE_SHM_PATH,
+    PERSISTENT_CACHE_FLUSH_INTERVAL,
+    PERSISTENT_CACHE_PATH,
+    REDIS_POOL_SIZE,
+    REDIS_TIMEOUT,
+    REDIS_URL,
+)
+from utils.cache import TTLCache
+from utils.logger import logger
+from utils.metrics import register_stats
+from utils.persistent_cache import PersistentCache
+
+
+class CacheBackend:
+    """Shared tier behind the per-process TTLCaches.
+
+    The base class is the in-process backend: it stores nothing, so every
+    process only has its own memory caches. Other backends share entries
+    between processes. Values are JSON-serialisable and stored with an
+    absolute expiry timestamp; writes never block the caller.
+    """
+
+    name = "memory"
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def get(self, namespace: str, key: str) -> Optional[Tuple[Any, float]]:
+        return None
+
+    def put(self, namespace: str, key: str, value: Any, ttl: float):
+        pass
+
+    async def load(self, namespace: str) -> List[Tuple[str, Any, float]]:
+        """Unexpired entries used to warm a fresh process, if the backend can list them"""
+        return []
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+
+class SQLiteBackend(CacheBackend):
+    """PersistentCache file shared by the processes of one host.
+
+    On a file in /dev/shm this is a shared-memory cache; on disk it also
+    survives restarts.
+    """
+
+    def __init__(self, name: str, path: str, flush_interval: float):
+        self.name = name
+        self.store = PersistentCache(path, flush_interval)
+
+    async def start(self):
+        await asyncio.to_thread(self.store.open)
+        self.store.start()
+
+    async def stop(self):
+        await self.store.stop()
+
+    async def get(self, namespace: str, key: str) -> Optional[Tuple[Any, float]]:
+        if not self.store.is_open:
+            return None
+        return await asyncio.to_thread(self.store.get, namespace, key)
+
+    def put(self, namespace: str, key: str, value: Any, ttl: float):
+        self.store.put(namespace, key, value, ttl)
+
+    async def load(self, namespace: str) -> List[Tuple[str, Any, float]]:
+        return await asyncio.to_thread(self.store.load, namespace)
+
+    def stats(self) -> Dict[str, Any]:
+        return self.store.stats()
+
+
+class RedisError(Exception):
+    pass
+
+
+# What a failed Redis round trip can raise; the caller carries on without the cache
+REDIS_ERRORS = (OSError, EOFError, asyncio.TimeoutError, RedisError)
+
+
+def _encode_command(*args: Any) -> bytes:
+    parts = [f"*{len(args)}\r\n".encode()]
+    for arg in args:
+        data = arg if isinstance(arg, bytes) else str(arg).encode()
+        parts.append(f"${len(data)}\r\n".encode())
+        parts.append(data)
+        parts.append(b"\r\n")
+    return b"".join(parts)
+
+
+async def _read_reply(reader: asyncio.StreamReader) -> Any:
+    line = await reader.readline()
+    if not line.endswith(b"\r\n"):
+        raise ConnectionError("Connection closed by Redis")
+
+    kind, payload = line[:1], line[1:-2]
+    if kind == b"+":
+        return payload.decode()
+    if kind == b"-":
+        raise RedisError(payload.decode())
+    if kind == b":":
+        return int(payload)
+    if kind == b"$":
+        length = int(payload)
+        if length < 0:
+            return None
+        return (await reader.readexactly(length + 2))[:-2]
+    if kind == b"*":
+        length = int(payload)
+        if length < 0:
+            return None
+        return [await _read_reply(reader) for _ in range(length)]
+    raise RedisError(f"Unexpected reply: {line!r}")
+
+
+class RedisBackend(CacheBackend):
+    """Cache shared over the Redis protocol (RESP) by any number of hosts.
+
+    Only GET and SET are used, so Redis, Valkey, KeyDB or a local stand-in
+    all work. Writes are queued and sent in pipelined batches by a
+    background task; reads use a small pool of connections.
+    """
+
+    name = "redis"
+
+    def __init__(self, url: str, pool_size: int, timeout: float, prefix: str = "weather-bot:"):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.prefix = prefix
+        self._idle: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+        self._connections = asyncio.Semaphore(pool_size)
+        self._pending: Dict[str, Tuple[bytes, int]] = {}
+        self._wakeup = asyncio.Event()
+        self._writer_task: asyncio.Task | None = None
+        self._stopping = False
+        self.reads = 0
+        self.writes = 0
+        self.errors = 0
+
+    def _key(self, namespace: str, key: str) -> str:
+        return f"{self.prefix}{namespace}:{key}"
+
+    async def _connect(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        setup = []
+        if self.password:
+            setup.append(_encode_command("AUTH", self.password))
+        if self.db:
+            setup.append(_encode_command("SELECT", self.db))
+        if setup:
+            writer.write(b"".join(setup))
+            for _ in setup:
+                await _read_reply(reader)
+        return reader, writer
+
+    async def execute(self, *commands: Tuple[Any, ...]) -> List[Any]:
+        """Send commands in one pipelined round trip and return their replies"""
+        async with self._connections:
+            connection = self._idle.pop() if self._idle else await self._connect()
+            reader, writer = connection
+            try:
+                writer.write(b"".join(_encode_command(*command) for command in commands))
+                replies = []
+                for _ in commands:
+                    try:
+                        replies.append(await _read_reply(reader))
+                    except RedisError as ex:
+                        replies.append(ex)
+            except BaseException:
+                # A half-read reply would corrupt the next command on this connection
+                writer.close()
+                raise
+            self._idle.append(connection)
+            return replies
+
+    async def start(self):
+        if self._writer_task is None:
+            self._writer_task = asyncio.create_task(self._write_loop())
+        replies = await asyncio.wait_for(self.execute(("PING",)), self.timeout)
+        if isinstance(replies[0], RedisError):
+            raise replies[0]
+        logger.info("Redis cache backend connected")
+
+    async def stop(self):
+        if self._writer_task is not None:
+            # Let the writer send what is queued rather than cutting a batch short
+            self._stopping = True
+            self._wakeup.set()
+            try:
+                await asyncio.wait_for(self._writer_task, self.timeout * 4)
+            except asyncio.TimeoutError:
+                # wait_for has cancelled the writer by now
+                logger.error("Timed out flushing writes to Redis")
+            self._writer_task = None
+        while self._idle:
+            _, writer = self._idle.pop()
+            writer.close()
+
+    async def get(self, namespace: str, key: str) -> Optional[Tuple[Any, float]]:
+        full_key = self._key(namespace, key)
+        pending = self._pending.get(full_key)
+        if pending is not None:
+            data = pending[0]
+        else:
+            self.reads += 1
+            try:
+                (data,) = await asyncio.wait_for(self.execute(("GET", full_key)), self.timeout)
+            except REDIS_ERRORS as ex:
+                self.errors += 1
+                logger.error(f"Error reading from Redis: {ex}")
+                return None
+            if data is None or isinstance(data, RedisError):
+                return None
+
+        expires_at, value = json.loads(data)
+        if expires_at <= time.time():
+            return None
+        return value, expires_at
+
+    def put(self, namespace: str, key: str, value: Any, ttl: float):
+        ttl_ms = int(ttl * 1000)
+        if ttl_ms <= 0:
+            return
+        data = json.dumps([time.time() + ttl, value]).encode()
+        self._pending[self._key(namespace, key)] = (data, ttl_ms)
+        self._wakeup.set()
+
+    async def _flush(self):
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        commands = [("SET", key, data, "PX", ttl_ms) for key, (data, ttl_ms) in pending.items()]
+        try:
+            await asyncio.wait_for(self.execute(*commands), self.timeout * 4)
+            self.writes += len(commands)
+        except REDIS_ERRORS as ex:
+            self.errors += 1
+            logger.error(f"Error writing to Redis: {ex}")
+
+    async def _write_loop(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            await self._flush()
+            if self._stopping and not self._pending:
+                return
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": len(self._pending),
+            "idle_connections": len(self._idle),
+            "reads": self.reads,
+            "writes": self.writes,
+            "errors": self.errors,
+        }
+
+
+def create_cache_backend(kind: str) -> CacheBackend:
+    if kind == "memory":
+        return CacheBackend()
+    if kind == "sqlite":
+        return SQLiteBackend("sqlite", PERSISTENT_CACHE_PATH, PERSISTENT_CACHE_FLUSH_INTERVAL)
+    if kind == "shm":
+        return SQLiteBackend("shm", CACHE_SHM_PATH, PERSISTENT_CACHE_FLUSH_INTERVAL)
+    if kind == "redis":
+        return RedisBackend(REDIS_URL, REDIS_POOL_SIZE, REDIS_TIMEOUT)
+    raise ValueError(f"Unknown CACHE_BACKEND: {kind}")
+
+
+cache_backend = create_cache_backend(CACHE_BACKEND)
+register_stats("weather_cache_backend", cache_backend.stats)
+
+
+class TieredCache:
+    """A process-local TTLCache backed by the shared cache backend.
+
+    Reads check local memory first, then the backend, and keep what they
+    find locally for the remaining lifetime of the entry. Writes go to
+    both. `encode`/`decode` turn values into JSON-friendly form and back.
+    """
+
+    def __init__(
+        self,
+        local: TTLCache,
+        encode: Callable[[Any], Any] = lambda value: value,
+        decode: Callable[[Any], Any] = lambda value: value,
+        backend: CacheBackend = cache_backend,
+    ):
+        self.local = local
+        self.encode = encode
+        self.decode = decode
+        self.backend = backend
+        self.shared_hits = 0
+
+    @property
+    def name(self) -> str:
+        return self.local.name
+
+    async def get(self, key: str) -> Optional[Any]:
+        value = self.local.get(key)
+        if value is not None:
+            return value
+
+        stored = await self.backend.get(self.name, key)
+        if stored is None:
+            return None
+
+        raw, expires_at = stored
+        value = self.decode(raw)
+        self.local.set(key, value, ttl=expires_at - time.time())
+        self.shared_hits += 1
+        return value
+
+    async def expires_in(self, key: str) -> Optional[float]:
+        """Seconds until key expires, adopting a fresher copy another process stored"""
+        remaining = self.local.expires_in(key)
+        stored = await self.backend.get(self.name, key)
+        if stored is not None:
+            raw, expires_at = stored
+            shared_remaining = expires_at - time.time()
+            if remaining is None or shared_remaining > remaining + 1:
+                self.local.set(key, self.decode(raw), ttl=shared_remaining)
+                remaining = shared_remaining
+        return remaining
+
+    def set(self, key: str, value: Any):
+        self.local.set(key, value)
+        self.backend.put(self.name, key, self.encode(value), self.local.ttl)
+
+    async def warm(self):
+        """Fill local memory from the backend, e.g. after a restart"""
+        entries = await self.backend.load(self.name)
+        now = time.time()
+        for key, raw, expires_at in entries:
+            self.local.set(key, self.decode(raw), ttl=expires_at - now)
+        if entries:
+            logger.info(f"Loaded {len(entries)} {self.name} cache entries")
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.local.stats(), "shared_hits": self.shared_hits}
+
+
+async def start_cache_backend():
+    try:
+        await cache_backend.start()
+    except (*REDIS_ERRORS, sqlite3.Error) as ex:
+        # The bot still works from its local caches: Redis reconnects per
+        # command and an SQLite store that failed to open stays unused
+        logger.error(f"Could not start {cache_backend.name} cache backend: {ex}")
+
+
+async def stop_cache_backend():
+    await cache_backend.stop()
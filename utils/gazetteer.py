@@ -0,0 +1,181 @@
+import re
+import asyncio
+import difflib
+from array import array
+from bisect import bisect_left
+from typing import Dict, List, Optional
+
+from config import GAZETTEER_PATH
+from utils.logger import logger
+
+
+def normalize_name(text: str) -> str:
+    """Case-, ё- and punctuation-insensitive form of a place name"""
+    text = text.casefold().replace("ё", "е")
+    text = re.sub(r"[\s\-_.,'’`]+", " ", text)
+    return text.strip()
+
+
+class City:
+    __slots__ = ("id", "country_code", "name_en", "name_ru", "lat", "lon", "population")
+
+    def __init__(
+        self,
+        id: str,
+        country_code: str,
+        name_en: str,
+        name_ru: str,
+        lat: float,
+        lon: float,
+        population: int,
+    ):
+        self.id = id
+        self.country_code = country_code
+        self.name_en = name_en
+        self.name_ru = name_ru
+        self.lat = lat
+        self.lon = lon
+        self.population = population
+
+    def name(self, lang: str) -> str:
+        return self.name_ru if lang == "ru" and self.name_ru else self.name_en
+
+
+class Gazetteer:
+    """Offline city table with an exact and a prefix index over all names.
+
+    The file is a TSV with rows of ``id, country, name_en, name_ru, lat,
+    lon, population, aliases``; aliases are comma separated. Every name
+    and alias is normalized and kept in one sorted list, so a prefix
+    lookup is a binary search followed by a short scan.
+    """
+
+    def __init__(self):
+        self.cities: List[City] = []
+        self.by_id: Dict[str, City] = {}
+        self._keys: List[str] = []
+        self._refs = array("I")
+        self._exact: Dict[str, List[int]] = {}
+        self.lookups = 0
+        self.suggestions = 0
+
+    def __len__(self) -> int:
+        return len(self.cities)
+
+    def load(self, path: str):
+        cities, names = [], []
+        with open(path, encoding="utf-8") as file:
+            for line in file:
+                if not line.strip() or line.startswith("#"):
+                    continue
+                row = line.rstrip("\n").split("\t")
+                if len(row) < 7:
+                    continue
+                try:
+                    city = City(
+                        row[0], row[1].upper(), row[2], row[3],
+                        float(row[4]), float(row[5]), int(row[6] or 0),
+                    )
+                except ValueError:
+                    continue
+
+                index = len(cities)
+                cities.append(city)
+                aliases = row[7].split(",") if len(row) > 7 else []
+                for name in {normalize_name(name) for name in (row[2], row[3], *aliases)}:
+                    if name:
+                        names.append((name, index))
+
+        names.sort()
+        exact: Dict[str, List[int]] = {}
+        for name, index in names:
+            exact.setdefault(name, []).append(index)
+        for indexes in exact.values():
+            indexes.sort(key=lambda index: -cities[index].population)
+
+        self.cities = cities
+        self.by_id = {city.id: city for city in cities}
+        self._keys = [name for name, _ in names]
+        self._refs = array("I", (index for _, index in names))
+        self._exact = exact
+        logger.info(f"Loaded {len(cities)} cities into gazetteer")
+
+    def resolve(self, query: str) -> Optional[City]:
+        """The city a complete name refers to, e.g. "Moscow" or "Moscow, RU" """
+        cities = self.matches(query, 1)
+        return cities[0] if cities else None
+
+    def matches(self, query: str, limit: int, min_share: float = 0.0) -> List[City]:
+        """Every city a complete name may refer to, most populous first.
+
+        Cities with less than `min_share` of the first one's population
+        are left out, so "Paris" stays Paris, France.
+        """
+        self.lookups += 1
+        name, _, country_code = query.rpartition(",")
+        if not name:
+            name, country_code = query, ""
+        country_code = country_code.strip().upper()
+
+        cities = []
+        for index in self._exact.get(normalize_name(name), []):
+            city = self.cities[index]
+            if not country_code or city.country_code == country_code:
+                if cities and city.population < cities[0].population * min_share:
+                    break
+                cities.append(city)
+                if len(cities) >= limit:
+                    break
+        return cities
+
+    def suggest(self, prefix: str, limit: int) -> List[City]:
+        """Most populous cities with a name starting with prefix"""
+        prefix = normalize_name(prefix)
+        if not prefix:
+            return []
+
+        found = set()
+        position = bisect_left(self._keys, prefix)
+        while position < len(self._keys) and self._keys[position].startswith(prefix):
+            found.add(self._refs[position])
+            position += 1
+        cities = sorted((self.cities[index] for index in found), key=lambda city: -city.population)
+        if cities:
+            self.suggestions += 1
+        return cities[:limit]
+
+    def starts_name(self, prefix: str) -> bool:
+        """Whether prefix is the first words of a longer name, e.g. "Mexico" """
+        prefix = normalize_name(prefix) + " "
+        position = bisect_left(self._keys, prefix)
+        return position < len(self._keys) and self._keys[position].startswith(prefix)
+
+    def close_matches(self, query: str, limit: int) -> List[City]:
+        """Cities whose name looks like a misspelling of query"""
+        names = difflib.get_close_matches(normalize_name(query), self._exact, n=limit, cutoff=0.75)
+        cities = []
+        for name in names:
+            city = self.cities[self._exact[name][0]]
+            if city not in cities:
+                cities.append(city)
+        return cities
+
+    def stats(self) -> dict:
+        return {
+            "cities": len(self.cities),
+            "names": len(self._keys),
+            "lookups": self.lookups,
+            "suggestions": self.suggestions,
+        }
+
+
+gazetteer = Gazetteer()
+
+
+async def start_gazetteer():
+    if not GAZETTEER_PATH:
+        return
+    try:
+        await asyncio.to_thread(gazetteer.load, GAZETTEER_PATH)
+    except OSError as ex:
+        logger.error(f"Could not load gazetteer: {ex}")
@@ -0,0 +1,100 @@
+import csv
+import asyncio
+import ipaddress
+from array import array
+from bisect import bisect_right
+from typing import Optional, Tuple
+
+from config import GEO_PREFIX_LENGTH, GEOIP_DB_PATH
+from utils.logger import logger
+
+
+def parse_ipv4(ip: str) -> Optional[int]:
+    try:
+        return int(ipaddress.IPv4Address(ip.strip()))
+    except ValueError:
+        return None
+
+
+def ip_prefix(ip: str, prefix_length: int = GEO_PREFIX_LENGTH) -> Optional[str]:
+    """Network an IP belongs to, e.g. 8.8.8.8 -> 8.8.8.0/24"""
+    try:
+        network = ipaddress.IPv4Network(f"{ip.strip()}/{prefix_length}", strict=False)
+    except ValueError:
+        return None
+    return str(network)
+
+
+def _parse_bound(value: str) -> Optional[int]:
+    value = value.strip()
+    if value.isdigit():
+        return int(value)
+    return parse_ipv4(value)
+
+
+class GeoDatabase:
+    """Offline IPv4 range -> (city, country code) table.
+
+    The file is a CSV with rows of ``start_ip,end_ip,city,country_code``;
+    bounds may be dotted addresses or integers and rows may come in any
+    order. IPv6 rows and malformed lines are skipped. Ranges are kept in
+    sorted arrays and looked up with a binary search.
+    """
+
+    def __init__(self):
+        self.starts = array("I")
+        self.ends = array("I")
+        self.locations: list[Tuple[str, str]] = []
+        self.lookups = 0
+        self.hits = 0
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def load(self, path: str):
+        rows = []
+        with open(path, newline="", encoding="utf-8") as file:
+            for row in csv.reader(file):
+                if len(row) < 4 or ":" in row[0]:
+                    continue
+                start, end = _parse_bound(row[0]), _parse_bound(row[1])
+                city, country_code = row[2].strip(), row[3].strip().upper()
+                if start is None or end is None or not city:
+                    continue
+                rows.append((start, end, city, country_code))
+
+        rows.sort()
+        self.starts = array("I", (row[0] for row in rows))
+        self.ends = array("I", (row[1] for row in rows))
+        self.locations = [(row[2], row[3]) for row in rows]
+        logger.info(f"Loaded {len(rows)} IP ranges from geo database")
+
+    def lookup(self, ip: str) -> Optional[Tuple[str, str]]:
+        if not self.starts:
+            return None
+
+        address = parse_ipv4(ip)
+        if address is None:
+            return None
+
+        self.lookups += 1
+        index = bisect_right(self.starts, address) - 1
+        if index >= 0 and address <= self.ends[index]:
+            self.hits += 1
+            return self.locations[index]
+        return None
+
+    def stats(self) -> dict:
+        return {"ranges": len(self), "lookups": self.lookups, "hits": self.hits}
+
+
+geo_database = GeoDatabase()
+
+
+async def start_geo_database():
+    if not GEOIP_DB_PATH:
+        return
+    try:
+        await asyncio.to_thread(geo_database.load, GEOIP_DB_PATH)
+    except (OSError, ValueError, OverflowError) as ex:
+        logger.error(f"Could not load geo database: {ex}")
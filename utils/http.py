@@ -0,0 +1,103 @@
+import asyncio
+import httpx
+from typing import Any, Dict
+
+from config import (
+    HTTP2,
+    HTTP_KEEPALIVE_EXPIRY,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE,
+    HTTP_WARMUP_CONNECTIONS,
+    IMGBB_BASE_URL,
+    IP_API_BASE_URL,
+    OPENWEATHERMAP_BASE_URL,
+    REQUEST_TIMEOUT,
+    UPLOAD_TIMEOUT,
+)
+from utils.logger import logger
+
+
+# One long-lived client per upstream host, so limits are per host
+clients: Dict[str, httpx.AsyncClient] = {}
+
+
+def _http2_available() -> bool:
+    if not HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        logger.warning("HTTP2 is enabled but the h2 package is not installed")
+        return False
+
+
+def _client_settings() -> Dict[str, Dict[str, Any]]:
+    return {
+        "openweathermap": dict(
+            base_url=OPENWEATHERMAP_BASE_URL,
+            timeout=REQUEST_TIMEOUT,
+            verify=False,
+        ),
+        "ip-api": dict(
+            base_url=IP_API_BASE_URL,
+            timeout=REQUEST_TIMEOUT,
+        ),
+        "imgbb": dict(
+            base_url=IMGBB_BASE_URL,
+            timeout=UPLOAD_TIMEOUT,
+        ),
+    }
+
+
+def _create_client(name: str) -> httpx.AsyncClient:
+    settings = _client_settings()[name]
+    limits = httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+    return httpx.AsyncClient(
+        limits=limits,
+        http2=_http2_available(),
+        **settings,
+    )
+
+
+def get_client(name: str) -> httpx.AsyncClient:
+    """Return the shared client for an upstream, creating it on first use"""
+    client = clients.get(name)
+    if client is None or client.is_closed:
+        client = _create_client(name)
+        clients[name] = client
+    return client
+
+
+async def _warm_up(name: str, client: httpx.AsyncClient):
+    async def open_connection():
+        try:
+            await client.head("/")
+        except httpx.HTTPError:
+            logger.debug(f"Warm-up request to {name} failed")
+
+    await asyncio.gather(
+        *(open_connection() for _ in range(HTTP_WARMUP_CONNECTIONS))
+    )
+
+
+async def start_http_clients():
+    for name in _client_settings():
+        get_client(name)
+
+    if HTTP_WARMUP_CONNECTIONS > 0:
+        await asyncio.gather(
+            *(_warm_up(name, client) for name, client in clients.items())
+        )
+    logger.info("HTTP clients started")
+
+
+async def close_http_clients():
+    for name, client in list(clients.items()):
+        await client.aclose()
+        clients.pop(name, None)
+    logger.info("HTTP clients closed")
@@ -1,11 +1,22 @@
 import time
 import asyncio
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
 from PIL import Image, ImageDraw, ImageFont
 from typing import Any, Dict
 from datetime import datetime
 import os
+from config import (
+    CARD_EFFORT,
+    CARD_FORMAT,
+    CARD_QUALITY,
+    PRECOMPOSE_LAYERS,
+)
 from utils.logger import logger
+from utils.metrics import STAGE_SECONDS, register_stats
+from utils.render_pool import render_executor
 
 
 FONT_LARGE: Any = None
@@ -16,12 +27,120 @@ DARK_IMG: Any = None
 GLOBE_IMG: Any = None
 LIGHT_EMOJI_CACHE: Dict[str, Image.Image] = {}
 DARK_EMOJI_CACHE: Dict[str, Image.Image] = {}
+# Composited background + globe + emoji, keyed by (is_night, emoji key)
+BASE_LAYER_CACHE: Dict[tuple[bool, str], Image.Image] = {}
+
+
+class TextSprite:
+    """Pre-rasterized text mask; colour is applied when it is pasted"""
+
+    __slots__ = ("mask", "left", "top", "right", "advance")
+
+    def __init__(self, mask: Image.Image, bbox: tuple, advance: float):
+        self.mask = mask
+        self.left, self.top, self.right, _ = bbox
+        self.advance = advance
+
+
+# Sprites keyed by (id(font), text), and static phrases per font, longest first
+SPRITE_CACHE: Dict[tuple[int, str], TextSprite] = {}
+STATIC_TEXT: Dict[int, tuple[str, ...]] = {}
+
+DAY_NAMES = {
+    "ru": {
+        "Monday": "понедельник",
+        "Tuesday": "вторник",
+        "Wednesday": "среда",
+        "Thursday": "четверг",
+        "Friday": "пятница",
+        "Saturday": "суббота",
+        "Sunday": "воскресенье",
+    },
+    "en": {
+        "Monday": "monday",
+        "Tuesday": "tuesday",
+        "Wednesday": "wednesday",
+        "Thursday": "thursday",
+        "Friday": "friday",
+        "Saturday": "saturday",
+        "Sunday": "sunday",
+    },
+}
+
+MONTH_NAMES = {
+    "ru": {
+        "Jan": "янв",
+        "Feb": "фев",
+        "Mar": "мар",
+        "Apr": "апр",
+        "May": "мая",
+        "Jun": "июн",
+        "Jul": "июл",
+        "Aug": "авг",
+        "Sep": "сен",
+        "Oct": "окт",
+        "Nov": "ноя",
+        "Dec": "дек",
+    },
+    "en": {
+        "Jan": "jan",
+        "Feb": "feb",
+        "Mar": "mar",
+        "Apr": "apr",
+        "May": "may",
+        "Jun": "jun",
+        "Jul": "jul",
+        "Aug": "aug",
+        "Sep": "sep",
+        "Oct": "oct",
+        "Nov": "nov",
+        "Dec": "dec",
+    },
+}
+
+CARD_LABELS = {
+    "ru": {
+        "pressure": " мм",
+        "humidity": "%",
+        "wind": " м/с",
+        "feels_like": "ощущается как",
+        "sunrise": "Восход",
+        "sunset": "Закат",
+        "separator": " | ",
+    },
+    "en": {
+        "pressure": " mm",
+        "humidity": "%",
+        "wind": " m/s",
+        "feels_like": "feels like",
+        "sunrise": "Sunrise",
+        "sunset": "Sunset",
+        "separator": " | ",
+    },
+}
+
+WIND_DIRECTIONS = (
+    "N", "NE", "E", "SE", "S", "SW", "W", "NW",
+    "С", "СВ", "В", "ЮВ", "Ю", "ЮЗ", "З", "СЗ",
+)
+
+# Characters of the numeric parts of a card (temperature, time, pressure...)
+SPRITE_GLYPHS = "0123456789+-,.:%°| "
+
+GLOBE_SIZE = (80, 80)
+GLOBE_POSITION = (227, 165)
+EMOJI_SIZE = (550, 550)
+EMOJI_POSITION = (985, 15)
 
 
 def load_resources():
     global FONT_LARGE, FONT_MEDIUM, FONT_TEMP, LIGHT_IMG, DARK_IMG, GLOBE_IMG
     global LIGHT_EMOJI_CACHE, DARK_EMOJI_CACHE
 
+    BASE_LAYER_CACHE.clear()
+    SPRITE_CACHE.clear()
+    STATIC_TEXT.clear()
+
     try:
         # Load fonts
         FONT_LARGE = ImageFont.truetype("assets/fonts/SF-Pro-Display-Medium.otf", 72)
@@ -85,6 +204,10 @@ def load_resources():
         if "thermometer" not in DARK_EMOJI_CACHE:
             DARK_EMOJI_CACHE["thermometer"] = Image.new("RGBA", (550, 550), (0, 0, 0, 0))
 
+        if PRECOMPOSE_LAYERS:
+            build_base_layers()
+        build_text_sprites()
+
         logger.info("Resources preloaded successfully")
         
     except FileNotFoundError as e:
@@ -94,7 +217,6 @@ def load_resources():
         logger.error("Error preloading resources")
         raise
 
-load_resources()
 
 def is_night_time(current_time_local: datetime) -> bool:
     hour = current_time_local.hour
@@ -103,62 +225,68 @@ def is_night_time(current_time_local: datetime) -> bool:
     return (hour >= 23) or (hour < 9) or (hour == 9 and minute == 0)
 
 
-def get_weather_emoji(description: str, current_time_local: datetime, size: tuple = (550, 550)) -> Image.Image:
+def _pick_emoji(emoji_cache: Dict[str, Image.Image], *keys: str) -> str:
+    for key in keys:
+        if key in emoji_cache:
+            return key
+    return "thermometer"
+
+
+def get_weather_emoji_key(description: str, is_night: bool) -> str:
+    desc_lower = description.lower()
+    emoji_cache = DARK_EMOJI_CACHE if is_night else LIGHT_EMOJI_CACHE
+
+    if any(word in desc_lower for word in ["ясно", "clear", "солнечно", "sunny"]):
+        return _pick_emoji(emoji_cache, "moon" if is_night else "sun")
+    elif any(word in desc_lower for word in ["небольшая облачность", "few clouds", "малооблачно"]):
+        return _pick_emoji(emoji_cache, "moon_cloud" if is_night else "sun_cloud", "cloud")
+    elif any(word in desc_lower for word in [
+        "облачно", "cloud", "пасмурно", "overcast", 
+        "broken clouds", "scattered clouds"
+    ]):
+        return _pick_emoji(emoji_cache, "cloud")
+    elif any(word in desc_lower for word in [
+        "дождь", "rain", "ливень", "shower", 
+        "drizzle", "морось", "изморось"
+    ]):
+        if any(word in desc_lower for word in [
+            "легкий", "light", "небольшой", "слабый", 
+            "drizzle", "морось"
+        ]):
+            return _pick_emoji(emoji_cache, "moon_cloud_rain" if is_night else "sun_cloud_rain", "rain")
+        return _pick_emoji(emoji_cache, "rain")
+    elif any(word in desc_lower for word in ["гроза", "thunderstorm", "storm", "шторм"]):
+        return _pick_emoji(emoji_cache, "storm")
+    elif any(word in desc_lower for word in [
+        "снег", "snow", "снегопад", "sleet", 
+        "graupel", "град", "hail"
+    ]):
+        return _pick_emoji(emoji_cache, "snow")
+    elif any(word in desc_lower for word in [
+        "туман", "fog", "mist", "дымка", "haze", 
+        "smoke", "mgla", "пыль", "dust", "песок", 
+        "sand", "ash", "volcanic"
+    ]):
+        return _pick_emoji(emoji_cache, "fog")
+    elif any(word in desc_lower for word in [
+        "шквал", "squall", "tornado", "торнадо", 
+        "hurricane", "ураган"
+    ]):
+        return _pick_emoji(emoji_cache, "tornado", "storm")
+    elif any(word in desc_lower for word in ["циклон", "cyclone"]):
+        return _pick_emoji(emoji_cache, "cyclone", "storm")
+    elif any(word in desc_lower for word in ["пыль", "dust", "песок", "sand"]):
+        return _pick_emoji(emoji_cache, "dust", "fog")
+    elif any(word in desc_lower for word in ["иней", "frost", "гололед", "ice", "гололедица"]):
+        return _pick_emoji(emoji_cache, "snow")
+    return "thermometer"
+
+
+def get_weather_emoji(description: str, current_time_local: datetime, size: tuple = EMOJI_SIZE) -> Image.Image:
     try:
-        desc_lower = description.lower()
         is_night = is_night_time(current_time_local)
-
         emoji_cache = DARK_EMOJI_CACHE if is_night else LIGHT_EMOJI_CACHE
-
-        if any(word in desc_lower for word in ["ясно", "clear", "солнечно", "sunny"]):
-            emoji_key = "moon" if is_night else "sun"
-            emoji = emoji_cache.get(emoji_key, emoji_cache["thermometer"])
-        elif any(word in desc_lower for word in ["небольшая облачность", "few clouds", "малооблачно"]):
-            emoji_key = "moon_cloud" if is_night else "sun_cloud"
-            emoji = emoji_cache.get(emoji_key, emoji_cache["cloud"])
-        elif any(word in desc_lower for word in [
-            "облачно", "cloud", "пасмурно", "overcast", 
-            "broken clouds", "scattered clouds"
-        ]):
-            emoji = emoji_cache.get("cloud", emoji_cache["thermometer"])
-        elif any(word in desc_lower for word in [
-            "дождь", "rain", "ливень", "shower", 
-            "drizzle", "морось", "изморось"
-        ]):
-            if any(word in desc_lower for word in [
-                "легкий", "light", "небольшой", "слабый", 
-                "drizzle", "морось"
-            ]):
-                emoji_key = "moon_cloud_rain" if is_night else "sun_cloud_rain"
-                emoji = emoji_cache.get(emoji_key, emoji_cache["rain"])
-            else:
-                emoji = emoji_cache.get("rain", emoji_cache["thermometer"])
-        elif any(word in desc_lower for word in ["гроза", "thunderstorm", "storm", "шторм"]):
-            emoji = emoji_cache.get("storm", emoji_cache["thermometer"])
-        elif any(word in desc_lower for word in [
-            "снег", "snow", "снегопад", "sleet", 
-            "graupel", "град", "hail"
-        ]):
-            emoji = emoji_cache.get("snow", emoji_cache["thermometer"])
-        elif any(word in desc_lower for word in [
-            "туман", "fog", "mist", "дымка", "haze", 
-            "smoke", "mgla", "пыль", "dust", "песок", 
-            "sand", "ash", "volcanic"
-        ]):
-            emoji = emoji_cache.get("fog", emoji_cache["thermometer"])
-        elif any(word in desc_lower for word in [
-            "шквал", "squall", "tornado", "торнадо", 
-            "hurricane", "ураган"
-        ]):
-            emoji = emoji_cache.get("tornado", emoji_cache.get("storm", emoji_cache["thermometer"]))
-        elif any(word in desc_lower for word in ["циклон", "cyclone"]):
-            emoji = emoji_cache.get("cyclone", emoji_cache.get("storm", emoji_cache["thermometer"]))
-        elif any(word in desc_lower for word in ["пыль", "dust", "песок", "sand"]):
-            emoji = emoji_cache.get("dust", emoji_cache.get("fog", emoji_cache["thermometer"]))
-        elif any(word in desc_lower for word in ["иней", "frost", "гололед", "ice", "гололедица"]):
-            emoji = emoji_cache.get("snow", emoji_cache["thermometer"])
-        else:
-            emoji = emoji_cache["thermometer"]
+        emoji = emoji_cache[get_weather_emoji_key(description, is_night)]
 
         return emoji.resize(size, Image.Resampling.LANCZOS)
 
@@ -167,6 +295,153 @@ def get_weather_emoji(description: str, current_time_local: datetime, size: tupl
         return Image.new("RGBA", size, (0, 0, 0, 0))
 
 
+def get_base_layer(is_night: bool, emoji_key: str) -> Image.Image:
+    """Background, globe and emoji composited once per (theme, emoji key)"""
+    layer = BASE_LAYER_CACHE.get((is_night, emoji_key))
+    if layer is not None:
+        return layer
+
+    background_img = DARK_IMG if is_night else LIGHT_IMG
+    emoji_cache = DARK_EMOJI_CACHE if is_night else LIGHT_EMOJI_CACHE
+
+    layer = Image.new("RGB", background_img.size, "white")
+    layer.paste(background_img, (0, 0))
+
+    resized_globe = GLOBE_IMG.resize(GLOBE_SIZE, Image.Resampling.LANCZOS)
+    layer.paste(resized_globe, GLOBE_POSITION, resized_globe)
+
+    emoji_img = emoji_cache[emoji_key].resize(EMOJI_SIZE, Image.Resampling.LANCZOS)
+    layer.paste(emoji_img, EMOJI_POSITION, emoji_img)
+
+    BASE_LAYER_CACHE[(is_night, emoji_key)] = layer
+    return layer
+
+
+def build_base_layers():
+    for is_night, emoji_cache in ((False, LIGHT_EMOJI_CACHE), (True, DARK_EMOJI_CACHE)):
+        for emoji_key in emoji_cache:
+            get_base_layer(is_night, emoji_key)
+
+
+def get_text_sprite(font: ImageFont.FreeTypeFont, text: str) -> TextSprite:
+    key = (id(font), text)
+    sprite = SPRITE_CACHE.get(key)
+    if sprite is not None:
+        return sprite
+
+    bbox = font.getbbox(text)
+    left, top, right, bottom = bbox
+    mask = Image.new("L", (max(right - left, 1), max(bottom - top, 1)), 0)
+    ImageDraw.Draw(mask).text((-left, -top), text, font=font, fill=255)
+
+    sprite = TextSprite(mask, bbox, font.getlength(text))
+    SPRITE_CACHE[key] = sprite
+    return sprite
+
+
+def build_text_sprites():
+    """Pre-rasterize fixed card labels and numeric glyphs for every font"""
+    medium_text = [
+        *(name for names in DAY_NAMES.values() for name in names.values()),
+        *(name for names in MONTH_NAMES.values() for name in names.values()),
+        *(labels[key] for labels in CARD_LABELS.values()
+          for key in ("pressure", "wind", "feels_like")),
+        *WIND_DIRECTIONS,
+        ", ",
+    ]
+    large_text = [
+        *(labels[key] for labels in CARD_LABELS.values()
+          for key in ("sunrise", "sunset", "separator")),
+    ]
+
+    for font, phrases in (
+        (FONT_MEDIUM, medium_text),
+        (FONT_LARGE, large_text),
+        (FONT_TEMP, []),
+    ):
+        phrases = sorted(set(phrases), key=len, reverse=True)
+        STATIC_TEXT[id(font)] = tuple(phrase for phrase in phrases if len(phrase) > 1)
+        for text in [*phrases, *SPRITE_GLYPHS]:
+            get_text_sprite(font, text)
+
+
+def _split_text(font: ImageFont.FreeTypeFont, text: str) -> list[str]:
+    phrases = STATIC_TEXT.get(id(font), ())
+    tokens = []
+    i = 0
+    while i < len(text):
+        for phrase in phrases:
+            if text.startswith(phrase, i):
+                tokens.append(phrase)
+                i += len(phrase)
+                break
+        else:
+            tokens.append(text[i])
+            i += 1
+    return tokens
+
+
+def layout_text(font: ImageFont.FreeTypeFont, text: str) -> list[tuple[float, TextSprite]]:
+    """Place cached sprites for text, returning (pen x, sprite) pairs"""
+    placed = []
+    pen_x = 0.0
+    for token in _split_text(font, text):
+        sprite = get_text_sprite(font, token)
+        placed.append((pen_x, sprite))
+        pen_x += sprite.advance
+    return placed
+
+
+def text_width(font: ImageFont.FreeTypeFont, text: str) -> int:
+    edges = [
+        (pen_x + sprite.left, pen_x + sprite.right)
+        for pen_x, sprite in layout_text(font, text)
+        if sprite.right > sprite.left
+    ]
+    if not edges:
+        return 0
+    return round(max(right for _, right in edges) - min(left for left, _ in edges))
+
+
+def draw_cached_text(
+    img: Image.Image,
+    xy: tuple[int, int],
+    text: str,
+    font: ImageFont.FreeTypeFont,
+    fill: Any,
+):
+    """Drop-in for ImageDraw.text that blits cached sprites"""
+    x, y = xy
+    for pen_x, sprite in layout_text(font, text):
+        if sprite.right > sprite.left:
+            img.paste(fill, (round(x + pen_x + sprite.left), y + sprite.top), sprite.mask)
+
+
+def card_fingerprint(weather_data: dict[str, Any]) -> str | None:
+    """Hash of everything create_weather_card_sync draws from weather_data"""
+    current_time_local = weather_data.get("current_time_local")
+    if not isinstance(current_time_local, datetime):
+        return None
+
+    fields = (
+        is_night_time(current_time_local),
+        current_time_local.strftime("%A, %d %b %H:%M"),
+        weather_data.get("lang", "en"),
+        weather_data.get("city", "Unknown City"),
+        weather_data.get("country", ""),
+        f"{weather_data.get('temp', 0):+.1f}",
+        f"{weather_data.get('feels_like', 0):+.1f}",
+        weather_data.get("pressure", 0),
+        weather_data.get("humidity", 0),
+        weather_data.get("wind_speed", 0),
+        weather_data.get("wind_dir", ""),
+        weather_data.get("description", ""),
+        weather_data.get("sunrise", ""),
+        weather_data.get("sunset", ""),
+    )
+    return hashlib.sha256(repr(fields).encode()).hexdigest()
+
+
 def calculate_dynamic_position(temp_text: str, font_temp: ImageFont.FreeTypeFont = None, base_x: int = 800) -> int:
     if font_temp is None:
         font_temp = FONT_TEMP
@@ -174,8 +449,7 @@ def calculate_dynamic_position(temp_text: str, font_temp: ImageFont.FreeTypeFont
     if font_temp is None:
         return base_x
 
-    temp_bbox = font_temp.getbbox(temp_text)
-    temp_width = temp_bbox[2] - temp_bbox[0] if temp_bbox else 0
+    temp_width = text_width(font_temp, temp_text)
 
     temp_start_x = 230
     fixed_offset = 70
@@ -199,226 +473,334 @@ async def create_weather_card_async(
             logger.error("Resources not loaded!")
             return False, None
 
-        loop = asyncio.get_event_loop()
-        success, card = await loop.run_in_executor(
-            None, create_weather_card_sync, weather_data
-        )
-
+        card_bytes, timings = await render_executor.render(weather_data)
         elapsed_time = time.time() - start_time
+        STAGE_SECONDS.observe(elapsed_time, stage="render")
+        if card_bytes is None:
+            return False, None
+
+        STAGE_SECONDS.observe(timings["draw"], stage="render_draw")
+        STAGE_SECONDS.observe(timings["encode"], stage="render_encode")
+        record_encode(CARD_FORMAT, timings["encode"], len(card_bytes))
+
         logger.info("Weather card created")
-        return success, card
+        return True, BytesIO(card_bytes)
 
     except Exception as e:
         logger.error("Error creating weather card")
         return False, None
 
 
+async def create_weather_cards_async(
+    batch: list[dict[str, Any]]
+) -> list[BytesIO | None]:
+    """Render several cards in one executor submission.
+
+    The cards share the loaded fonts, templates, base layers and text
+    sprites, identical cards are drawn once, and encoding runs side by
+    side, so a batch takes about as long as its slowest card. Cards that
+    fail to render are None.
+    """
+    if not batch:
+        return []
+    if any(resource is None for resource in [
+        FONT_LARGE, FONT_MEDIUM, FONT_TEMP,
+        LIGHT_IMG, DARK_IMG, GLOBE_IMG
+    ]):
+        logger.error("Resources not loaded!")
+        return [None] * len(batch)
+
+    unique: Dict[Any, dict[str, Any]] = {}
+    keys = []
+    for index, weather_data in enumerate(batch):
+        key = card_fingerprint(weather_data) or index
+        unique.setdefault(key, weather_data)
+        keys.append(key)
+
+    start_time = time.time()
+    try:
+        cards, timings = await render_executor.render_batch(list(unique.values()))
+    except Exception as e:
+        logger.error("Error creating weather cards")
+        return [None] * len(batch)
+    STAGE_SECONDS.observe(time.time() - start_time, stage="render_batch")
+    STAGE_SECONDS.observe(timings["draw"], stage="render_draw")
+    STAGE_SECONDS.observe(timings["encode"], stage="render_encode")
+
+    rendered = {}
+    for key, card_bytes, elapsed in zip(unique, cards, timings["encode_each"]):
+        if card_bytes is not None:
+            record_encode(CARD_FORMAT, elapsed, len(card_bytes))
+        rendered[key] = card_bytes
+
+    logger.info(f"{len(unique)} weather cards created")
+    return [
+        BytesIO(rendered[key]) if rendered[key] is not None else None
+        for key in keys
+    ]
+
+
 def create_weather_card_sync(
     weather_data: dict[str, Any]
 ) -> tuple[bool, BytesIO | None]:
-    
+    main_img = draw_weather_card(weather_data)
+    if main_img is None:
+        return False, None
+
+    try:
+        card_bytes, _ = encode_card(main_img)
+    except Exception as e:
+        logger.error("Error encoding weather card")
+        return False, None
+
+    return True, BytesIO(card_bytes)
+
+
+def draw_weather_card(weather_data: dict[str, Any]) -> Image.Image | None:
     try:
         current_time_local = weather_data.get("current_time_local")
-        lang = weather_data.get("lang", "en") 
         
         if not isinstance(current_time_local, datetime):
             logger.error("Invalid current_time_local in weather_data")
-            return False, None
+            return None
             
         is_night = is_night_time(current_time_local)
 
         logger.debug("Creating weather card")
 
-        background_img = DARK_IMG if is_night else LIGHT_IMG
+        main_img = compose_card_base(weather_data, is_night)
+        draw_card_text(main_img, weather_data, is_night)
+        return main_img
+
+    except Exception as e:
+        logger.error("Error creating weather card synchronously")
+        return None
+
+
+def compose_card_base(weather_data: dict[str, Any], is_night: bool) -> Image.Image:
+    """Copy of the static layers (background, globe, emoji) for a card"""
+    emoji_key = get_weather_emoji_key(
+        weather_data.get("description", ""),
+        is_night
+    )
+    return get_base_layer(is_night, emoji_key).copy()
+
+
+def draw_card_text(main_img: Image.Image, weather_data: dict[str, Any], is_night: bool):
+    current_time_local = weather_data["current_time_local"]
+    lang = weather_data.get("lang", "en")
+
+    draw = ImageDraw.Draw(main_img)
+
+    if is_night:
+        # Night colors
+        city_color = "#e4e4e5"
+        date_color = "#91939c"
+        temp_color = "#e4e4e5"
+        right_block_color = "#91939c"
+        description_color = "#e4e4e5"
+        sunrise_color = "#e4e4e5"
+    else:
+        city_color = "#404040"
+        date_color = (140, 140, 146)
+        temp_color = "#404040"
+        right_block_color = (140, 140, 146)
+        description_color = "#404040"
+        sunrise_color = "#404040"
+
+    city = weather_data.get("city", "Unknown City")
+    country = weather_data.get("country", "")
+    city_name = f"{city[:15]}..." if len(city) > 15 else city
+    draw.text(
+        (325, 170),
+        f"{city_name}, {country}",
+        font=FONT_LARGE,
+        fill=city_color
+    )
+
+    current_time_str = current_time_local.strftime("%A, %d %b %H:%M")
+
+    day_translation = DAY_NAMES["ru" if lang == "ru" else "en"]
+    month_translation = MONTH_NAMES["ru" if lang == "ru" else "en"]
+    labels = CARD_LABELS["ru" if lang == "ru" else "en"]
+
+    for eng, translated in day_translation.items():
+        current_time_str = current_time_str.replace(eng, translated)
+    for eng, translated in month_translation.items():
+        current_time_str = current_time_str.replace(eng, translated)
+
+    draw_cached_text(
+        main_img,
+        (230, 265), 
+        current_time_str, 
+        font=FONT_MEDIUM, 
+        fill=date_color
+    )
+
+    temp = weather_data.get("temp", 0)
+    temp_text = f"{temp:+.1f}°".replace(".", ",")
+    draw_cached_text(main_img, (230, 360), temp_text, font=FONT_TEMP, fill=temp_color)
+
+    right_block_x = calculate_dynamic_position(temp_text)
+
+    pressure = weather_data.get("pressure", 0)
+    humidity = weather_data.get("humidity", 0)
+    wind_speed = weather_data.get("wind_speed", 0)
+    wind_dir = weather_data.get("wind_dir", "")
+    feels_like = weather_data.get("feels_like", 0)
+    
+    right_color = right_block_color if is_night else "#7a7b81"
+
+    draw_cached_text(
+        main_img,
+        (right_block_x, 390),
+        f"{pressure}{labels['pressure']} | {humidity}{labels['humidity']}",
+        font=FONT_MEDIUM,
+        fill=right_color,
+    )
+
+    draw_cached_text(
+        main_img,
+        (right_block_x, 460),
+        f"{wind_speed}{labels['wind']}, {wind_dir}",
+        font=FONT_MEDIUM,
+        fill=right_color,
+    )
+
+    feels_like_text = f"{labels['feels_like']} {feels_like:+.1f}°".replace(".", ",")
+    draw_cached_text(
+        main_img,
+        (right_block_x, 530),
+        feels_like_text,
+        font=FONT_MEDIUM,
+        fill=right_color,
+    )
+
+    description = weather_data.get("description", "").capitalize()
+    draw.text(
+        (230, 630),
+        description,
+        font=FONT_LARGE,
+        fill=description_color,
+    )
+
+    sunrise_time = weather_data.get("sunrise", "")
+    sunset_time = weather_data.get("sunset", "")
+    
+    sunrise_text = (
+        f"{labels['sunrise']} {sunrise_time}{labels['separator']}"
+        f"{labels['sunset']} {sunset_time}"
+    )
+    
+    draw_cached_text(
+        main_img,
+        (230, 728),
+        sunrise_text,
+        font=FONT_LARGE,
+        fill=sunrise_color,
+    )
+
 
-        main_img = Image.new("RGB", background_img.size, "white")
-        main_img.paste(background_img, (0, 0))
+def _encode_png(img: Image.Image, out: BytesIO):
+    img.save(out, "PNG", compress_level=min(CARD_EFFORT, 9))
 
-        new_size = (80, 80)
-        resized_globe = GLOBE_IMG.resize(new_size, Image.Resampling.LANCZOS)
-        main_img.paste(resized_globe, (227, 165), resized_globe)
 
-        emoji_img = get_weather_emoji(
-            weather_data.get("description", ""), 
-            current_time_local
-        )
-        main_img.paste(emoji_img, (985, 15), emoji_img)
+def _encode_png8(img: Image.Image, out: BytesIO):
+    quantized = img.quantize(colors=256, method=Image.Quantize.FASTOCTREE)
+    quantized.save(out, "PNG", compress_level=min(CARD_EFFORT, 9))
 
-        draw = ImageDraw.Draw(main_img)
 
-        if is_night:
-            # Night colors
-            city_color = "#e4e4e5"
-            date_color = "#91939c"
-            temp_color = "#e4e4e5"
-            right_block_color = "#91939c"
-            description_color = "#e4e4e5"
-            sunrise_color = "#e4e4e5"
-        else:
-            city_color = "#404040"
-            date_color = (140, 140, 146)
-            temp_color = "#404040"
-            right_block_color = (140, 140, 146)
-            description_color = "#404040"
-            sunrise_color = "#404040"
-
-        city = weather_data.get("city", "Unknown City")
-        country = weather_data.get("country", "")
-        city_name = f"{city[:15]}..." if len(city) > 15 else city
-        draw.text(
-            (325, 170),
-            f"{city_name}, {country}",
-            font=FONT_LARGE,
-            fill=city_color
-        )
-
-        current_time_str = current_time_local.strftime("%A, %d %b %H:%M")
-
-        if lang == "ru":
-            day_translation = {
-                "Monday": "понедельник",
-                "Tuesday": "вторник",
-                "Wednesday": "среда",
-                "Thursday": "четверг",
-                "Friday": "пятница",
-                "Saturday": "суббота",
-                "Sunday": "воскресенье",
-            }
-            month_translation = {
-                "Jan": "янв",
-                "Feb": "фев",
-                "Mar": "мар",
-                "Apr": "апр",
-                "May": "мая",
-                "Jun": "июн",
-                "Jul": "июл",
-                "Aug": "авг",
-                "Sep": "сен",
-                "Oct": "окт",
-                "Nov": "ноя",
-                "Dec": "дек",
-            }
-        else:
-            day_translation = {
-                "Monday": "monday",
-                "Tuesday": "tuesday",
-                "Wednesday": "wednesday",
-                "Thursday": "thursday",
-                "Friday": "friday",
-                "Saturday": "saturday",
-                "Sunday": "sunday",
-            }
-            month_translation = {
-                "Jan": "jan",
-                "Feb": "feb",
-                "Mar": "mar",
-                "Apr": "apr",
-                "May": "may",
-                "Jun": "jun",
-                "Jul": "jul",
-                "Aug": "aug",
-                "Sep": "sep",
-                "Oct": "oct",
-                "Nov": "nov",
-                "Dec": "dec",
-            }
-
-        for eng, translated in day_translation.items():
-            current_time_str = current_time_str.replace(eng, translated)
-        for eng, translated in month_translation.items():
-            current_time_str = current_time_str.replace(eng, translated)
-
-        draw.text(
-            (230, 265), 
-            current_time_str, 
-            font=FONT_MEDIUM, 
-            fill=date_color
-        )
-
-        temp = weather_data.get("temp", 0)
-        temp_text = f"{temp:+.1f}°".replace(".", ",")
-        draw.text((230, 360), temp_text, font=FONT_TEMP, fill=temp_color)
-
-        right_block_x = calculate_dynamic_position(temp_text)
-
-        pressure = weather_data.get("pressure", 0)
-        humidity = weather_data.get("humidity", 0)
-        wind_speed = weather_data.get("wind_speed", 0)
-        wind_dir = weather_data.get("wind_dir", "")
-        feels_like = weather_data.get("feels_like", 0)
-
-        if lang == "ru":
-            pressure_label = " мм"
-            humidity_label = "%"
-            wind_label = " м/с"
-            feels_like_label = "ощущается как"
-        else:
-            pressure_label = " mm"
-            humidity_label = "%"
-            wind_label = " m/s"
-            feels_like_label = "feels like"
-        
-        right_color = right_block_color if is_night else "#7a7b81"
-
-        draw.text(
-            (right_block_x, 390),
-            f"{pressure}{pressure_label} | {humidity}{humidity_label}",
-            font=FONT_MEDIUM,
-            fill=right_color,
-        )
-
-        draw.text(
-            (right_block_x, 460),
-            f"{wind_speed}{wind_label}, {wind_dir}",
-            font=FONT_MEDIUM,
-            fill=right_color,
-        )
-
-        feels_like_text = f"{feels_like_label} {feels_like:+.1f}°".replace(".", ",")
-        draw.text(
-            (right_block_x, 530),
-            feels_like_text,
-            font=FONT_MEDIUM,
-            fill=right_color,
-        )
-
-        description = weather_data.get("description", "").capitalize()
-        draw.text(
-            (230, 630),
-            description,
-            font=FONT_LARGE,
-            fill=description_color,
-        )
-
-        sunrise_time = weather_data.get("sunrise", "")
-        sunset_time = weather_data.get("sunset", "")
-        
-        if lang == "ru":
-            sunrise_label = "Восход"
-            sunset_label = "Закат"
-            separator = " | "
-        else:
-            sunrise_label = "Sunrise"
-            sunset_label = "Sunset"
-            separator = " | "
-        
-        sunrise_text = f"{sunrise_label} {sunrise_time}{separator}{sunset_label} {sunset_time}"
-        
-        draw.text(
-            (230, 728),
-            sunrise_text,
-            font=FONT_LARGE,
-            fill=sunrise_color,
-        )
-
-        out = BytesIO()
-        main_img.save(out, "PNG", optimize=True, quality=85)
-        out.seek(0)
-        return True, out
+def _encode_webp(img: Image.Image, out: BytesIO):
+    img.save(out, "WEBP", quality=CARD_QUALITY, method=min(CARD_EFFORT, 6))
 
-    except Exception as e:
-        logger.error("Error creating weather card synchronously")
-        return False, None
+
+def _encode_jpeg(img: Image.Image, out: BytesIO):
+    img.save(out, "JPEG", quality=CARD_QUALITY, optimize=CARD_EFFORT >= 6)
+
+
+CARD_ENCODERS = {
+    "png": _encode_png,
+    "png8": _encode_png8,
+    "webp": _encode_webp,
+    "jpeg": _encode_jpeg,
+}
+
+CARD_EXTENSIONS = {
+    "png": "png",
+    "png8": "png",
+    "webp": "webp",
+    "jpeg": "jpg",
+}
+
+if CARD_FORMAT not in CARD_ENCODERS:
+    raise ValueError(f"Unknown CARD_FORMAT: {CARD_FORMAT}")
+
+# Encoded cards, encode seconds and output bytes, each by format
+ENCODE_STATS: Dict[str, Dict[str, float]] = {"cards": {}, "seconds": {}, "bytes": {}}
+
+
+def encode_card(img: Image.Image, fmt: str = CARD_FORMAT) -> tuple[bytes, float]:
+    """Encode a drawn card, returning the bytes and the encode time"""
+    encoder = CARD_ENCODERS[fmt]
+
+    start_time = time.perf_counter()
+    out = BytesIO()
+    encoder(img, out)
+    elapsed = time.perf_counter() - start_time
+
+    card_bytes = out.getvalue()
+    logger.debug(f"Card encoded as {fmt}: {len(card_bytes)} bytes in {elapsed:.3f}s")
+    return card_bytes, elapsed
+
+
+# Encodes the cards of a batch side by side; Pillow releases the GIL
+# while compressing, so these threads run in parallel
+_encode_pool: ThreadPoolExecutor | None = None
+_encode_pool_lock = threading.Lock()
+
+
+def _encode_pool_executor() -> ThreadPoolExecutor:
+    global _encode_pool
+    with _encode_pool_lock:
+        if _encode_pool is None:
+            _encode_pool = ThreadPoolExecutor(
+                max_workers=os.cpu_count() or 1,
+                thread_name_prefix="encode",
+            )
+    return _encode_pool
+
+
+def _encode_or_none(img: Image.Image | None, fmt: str) -> tuple[bytes | None, float]:
+    if img is None:
+        return None, 0.0
+    try:
+        return encode_card(img, fmt)
+    except Exception:
+        logger.error("Error encoding weather card")
+        return None, 0.0
+
+
+def encode_cards(
+    images: list[Image.Image | None], fmt: str = CARD_FORMAT
+) -> list[tuple[bytes | None, float]]:
+    """encode_card() for several drawn cards at once; None images stay None"""
+    if sum(img is not None for img in images) <= 1:
+        return [_encode_or_none(img, fmt) for img in images]
+
+    executor = _encode_pool_executor()
+    futures = [executor.submit(_encode_or_none, img, fmt) for img in images]
+    return [future.result() for future in futures]
+
+
+register_stats("weather_card_encode", lambda: ENCODE_STATS)
+
+
+def record_encode(fmt: str, elapsed: float, size: int):
+    ENCODE_STATS["cards"][fmt] = ENCODE_STATS["cards"].get(fmt, 0) + 1
+    ENCODE_STATS["seconds"][fmt] = ENCODE_STATS["seconds"].get(fmt, 0.0) + elapsed
+    ENCODE_STATS["bytes"][fmt] = ENCODE_STATS["bytes"].get(fmt, 0) + size
 
 
 create_weather_card = create_weather_card_async
+
+load_resources()
@@ -0,0 +1,201 @@
+import os
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from aiohttp import web
+
+from utils.logger import logger
+
+
+CONTENT_TYPES = {
+    "png": "image/png",
+    "webp": "image/webp",
+    "jpg": "image/jpeg",
+}
+
+# Names are hashes of the content, so a URL never changes what it serves
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def card_name(data: bytes, extension: str) -> str:
+    return f"{hashlib.sha256(data).hexdigest()[:32]}.{extension}"
+
+
+class MemoryImageStore:
+    """Least recently served images kept in memory up to max_bytes"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._images: "OrderedDict[str, bytes]" = OrderedDict()
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._images)
+
+    async def put(self, name: str, data: bytes):
+        if name in self._images:
+            self._images.move_to_end(name)
+            return
+        self._images[name] = data
+        self.bytes += len(data)
+        while self.bytes > self.max_bytes and len(self._images) > 1:
+            _, evicted = self._images.popitem(last=False)
+            self.bytes -= len(evicted)
+            self.evictions += 1
+
+    async def get(self, name: str) -> Optional[bytes]:
+        data = self._images.get(name)
+        if data is not None:
+            self._images.move_to_end(name)
+        return data
+
+
+class DiskImageStore:
+    """Images as files in one directory, oldest removed beyond max_bytes.
+
+    Several processes can share the directory; each one only evicts the
+    files it knows about, so the limit holds per process.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._files: "OrderedDict[str, int]" = OrderedDict()
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+    def open(self):
+        os.makedirs(self.path, exist_ok=True)
+        entries = []
+        for entry in os.scandir(self.path):
+            if entry.is_file() and not entry.name.startswith("."):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name, stat.st_size))
+        for _, name, size in sorted(entries):
+            self._files[name] = size
+            self.bytes += size
+        self._evict()
+
+    def _write(self, name: str, data: bytes):
+        # Written under a temporary name so a file is never served half-written
+        temporary = os.path.join(self.path, f".{name}.{os.getpid()}")
+        with open(temporary, "wb") as file:
+            file.write(data)
+        os.replace(temporary, os.path.join(self.path, name))
+
+    def _read(self, name: str) -> Optional[bytes]:
+        try:
+            with open(os.path.join(self.path, name), "rb") as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+    def _evict(self):
+        while self.bytes > self.max_bytes and len(self._files) > 1:
+            name, size = self._files.popitem(last=False)
+            self.bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(os.path.join(self.path, name))
+            except FileNotFoundError:
+                pass
+
+    async def put(self, name: str, data: bytes):
+        if name in self._files:
+            self._files.move_to_end(name)
+            return
+        await asyncio.to_thread(self._write, name, data)
+        self._files[name] = len(data)
+        self.bytes += len(data)
+        if self.bytes > self.max_bytes:
+            await asyncio.to_thread(self._evict)
+
+    async def get(self, name: str) -> Optional[bytes]:
+        if name in self._files:
+            self._files.move_to_end(name)
+        return await asyncio.to_thread(self._read, name)
+
+
+class ImageServer:
+    """Serves stored cards over HTTP at {public_url}/cards/{sha256}.{ext}"""
+
+    def __init__(
+        self,
+        store: MemoryImageStore | DiskImageStore,
+        host: str,
+        port: int,
+        public_url: str,
+        reuse_port: bool = False,
+    ):
+        self.store = store
+        self.host = host
+        self.port = port
+        self.public_url = public_url.rstrip("/")
+        self.reuse_port = reuse_port
+        self._runner: web.AppRunner | None = None
+        self.stored = 0
+        self.served = 0
+        self.not_modified = 0
+        self.not_found = 0
+
+    async def store_card(self, data: bytes, extension: str) -> str:
+        """Keep a card and return the public URL it is served at"""
+        name = card_name(data, extension)
+        await self.store.put(name, data)
+        self.stored += 1
+        return f"{self.public_url}/cards/{name}"
+
+    async def handle(self, request: web.Request) -> web.Response:
+        name = request.match_info["name"]
+        extension = name.rpartition(".")[2]
+        if extension not in CONTENT_TYPES:
+            self.not_found += 1
+            raise web.HTTPNotFound()
+
+        etag = f'"{name.partition(".")[0]}"'
+        headers = {"Cache-Control": CACHE_CONTROL, "ETag": etag}
+        if request.headers.get("If-None-Match") == etag:
+            self.not_modified += 1
+            return web.Response(status=304, headers=headers)
+
+        data = await self.store.get(name)
+        if data is None:
+            self.not_found += 1
+            raise web.HTTPNotFound()
+        self.served += 1
+        return web.Response(body=data, content_type=CONTENT_TYPES[extension], headers=headers)
+
+    async def start(self):
+        if self._runner is not None:
+            return
+        if isinstance(self.store, DiskImageStore):
+            await asyncio.to_thread(self.store.open)
+
+        app = web.Application()
+        app.router.add_get("/cards/{name}", self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port, reuse_port=self.reuse_port).start()
+        logger.info(f"Cards served on {self.host}:{self.port}/cards")
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "images": len(self.store),
+            "bytes": self.store.bytes,
+            "evictions": self.store.evictions,
+            "stored": self.stored,
+            "served": self.served,
+            "not_modified": self.not_modified,
+            "not_found": self.not_found,
+        }
@@ -0,0 +1,230 @@
+import re
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+from aiohttp import web
+
+from config import METRICS_HOST, METRICS_PORT, WORKER_INDEX
+from utils.logger import logger
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str] | LabelKey) -> str:
+    items = labels.items() if isinstance(labels, dict) else labels
+    if not items:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in items) + "}"
+
+
+def _metric_name(name: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self.values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1, **labels: Any):
+        key = _label_key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self) -> Iterator[Tuple[str, LabelKey, float]]:
+        for key, value in self.values.items():
+            yield self.name, key, value
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: Any):
+        self.values[_label_key(labels)] = value
+
+    def dec(self, amount: float = 1, **labels: Any):
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track(self, **labels: Any):
+        """Count the block as in progress while it runs"""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        # label key -> (per-bucket counts, sum, count)
+        self.values: Dict[LabelKey, List[Any]] = {}
+
+    def observe(self, value: float, **labels: Any):
+        key = _label_key(labels)
+        series = self.values.get(key)
+        if series is None:
+            series = self.values[key] = [[0] * len(self.buckets), 0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[0][i] += 1
+        series[1] += value
+        series[2] += 1
+
+    @contextmanager
+    def time(self, **labels: Any):
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start_time, **labels)
+
+    def samples(self) -> Iterator[Tuple[str, LabelKey, float]]:
+        for key, (counts, total, count) in self.values.items():
+            for bound, bucket_count in zip(self.buckets, counts):
+                yield f"{self.name}_bucket", key + (("le", str(bound)),), bucket_count
+            yield f"{self.name}_bucket", key + (("le", "+Inf"),), count
+            yield f"{self.name}_sum", key, total
+            yield f"{self.name}_count", key, count
+
+
+_metrics: List[Any] = []
+_stats_sources: List[Tuple[str, Callable[[], Dict[str, Any]]]] = []
+
+
+def counter(name: str, help: str) -> Counter:
+    metric = Counter(name, help)
+    _metrics.append(metric)
+    return metric
+
+
+def gauge(name: str, help: str) -> Gauge:
+    metric = Gauge(name, help)
+    _metrics.append(metric)
+    return metric
+
+
+def histogram(name: str, help: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+    metric = Histogram(name, help, buckets)
+    _metrics.append(metric)
+    return metric
+
+
+def register_stats(prefix: str, stats: Callable[[], Dict[str, Any]]):
+    """Expose the numbers of a stats() dict as gauges named prefix_key.
+
+    Nested dicts become a `key` label, so {"per_worker": {"w1": {"cards": 3}}}
+    turns into prefix_per_worker_cards{key="w1"} 3.
+    """
+    _stats_sources.append((prefix, stats))
+
+
+def _flatten(prefix: str, stats: Dict[str, Any], labels: Dict[str, str]) -> Iterator[Sample]:
+    for key, value in stats.items():
+        name = f"{prefix}_{key}"
+        if isinstance(value, bool):
+            yield name, labels, int(value)
+        elif isinstance(value, (int, float)):
+            yield name, labels, value
+        elif isinstance(value, dict):
+            for sub_key, sub_value in value.items():
+                sub_labels = {**labels, "key": str(sub_key)}
+                if isinstance(sub_value, dict):
+                    yield from _flatten(name, sub_value, sub_labels)
+                elif isinstance(sub_value, (int, float)):
+                    yield name, sub_labels, sub_value
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in _metrics:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, key, value in metric.samples():
+            lines.append(f"{name}{_format_labels(key)} {value}")
+
+    grouped: Dict[str, List[str]] = {}
+    for prefix, stats in _stats_sources:
+        try:
+            samples = list(_flatten(prefix, stats(), {}))
+        except Exception as ex:
+            logger.error(f"Error collecting {prefix} stats: {ex}")
+            continue
+        for name, labels, value in samples:
+            name = _metric_name(name)
+            grouped.setdefault(name, []).append(f"{name}{_format_labels(labels)} {value}")
+
+    for name, samples in grouped.items():
+        lines.append(f"# TYPE {name} gauge")
+        lines.extend(samples)
+
+    return "\n".join(lines) + "\n"
+
+
+# Pipeline instrumentation shared by handlers and utils
+STAGE_SECONDS = histogram(
+    "weather_stage_seconds", "Time spent in each stage of the inline pipeline"
+)
+UPLOAD_SECONDS = histogram(
+    "weather_upload_seconds", "Card upload attempts by backend and outcome"
+)
+QUERY_SECONDS = histogram(
+    "weather_inline_query_seconds", "End-to-end inline query latency by outcome"
+)
+QUERIES_IN_FLIGHT = gauge(
+    "weather_inline_queries_in_flight", "Inline queries being processed"
+)
+
+
+async def _metrics_handler(request: web.Request) -> web.Response:
+    return web.Response(
+        text=render_metrics(),
+        content_type="text/plain",
+        charset="utf-8",
+        headers={"X-Content-Type-Options": "nosniff"},
+    )
+
+
+_runner: web.AppRunner | None = None
+
+
+async def start_metrics_server():
+    global _runner
+    if not METRICS_PORT or _runner is not None:
+        return
+
+    # Every webhook worker process exposes its own registry
+    port = METRICS_PORT + WORKER_INDEX
+    app = web.Application()
+    app.router.add_get("/metrics", _metrics_handler)
+    _runner = web.AppRunner(app, access_log=None)
+    await _runner.setup()
+    await web.TCPSite(_runner, METRICS_HOST, port).start()
+    logger.info(f"Metrics served on {METRICS_HOST}:{port}/metrics")
+
+
+async def stop_metrics_server():
+    global _runner
+    if _runner is not None:
+        await _runner.cleanup()
+        _runner = None
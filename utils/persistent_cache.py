@@ -0,0 +1,151 @@
+import json
+import time
+import asyncio
+import sqlite3
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.logger import logger
+
+
+class PersistentCache:
+    """SQLite store for cache entries that outlives the process.
+
+    The database runs in WAL mode so several bot processes on one host can
+    read and write the same file. Writes are buffered and flushed in
+    batches by a background task (write-behind); reads go straight to the
+    database. Values are stored as JSON with an absolute expiry timestamp.
+    """
+
+    def __init__(self, path: str, flush_interval: float):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._db: sqlite3.Connection | None = None
+        self._pending: Dict[Tuple[str, str], Tuple[str, float]] = {}
+        self._flush_task: asyncio.Task | None = None
+        self.writes = 0
+        self.reads = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    @property
+    def is_open(self) -> bool:
+        return self._db is not None
+
+    def open(self):
+        if not self.enabled or self._db is not None:
+            return
+
+        db = sqlite3.connect(
+            self.path,
+            timeout=5,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        try:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " namespace TEXT NOT NULL,"
+                " key TEXT NOT NULL,"
+                " value TEXT NOT NULL,"
+                " expires_at REAL NOT NULL,"
+                " PRIMARY KEY (namespace, key)"
+                ") WITHOUT ROWID"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires_at)")
+        except sqlite3.Error:
+            db.close()
+            raise
+        self._db = db
+        logger.info("Persistent cache opened")
+
+    def load(self, namespace: str) -> List[Tuple[str, Any, float]]:
+        """Unexpired entries of a namespace, soonest expiry first"""
+        if self._db is None:
+            return []
+
+        rows = self._db.execute(
+            "SELECT key, value, expires_at FROM cache"
+            " WHERE namespace = ? AND expires_at > ? ORDER BY expires_at",
+            (namespace, time.time()),
+        ).fetchall()
+        return [(key, json.loads(value), expires_at) for key, value, expires_at in rows]
+
+    def get(self, namespace: str, key: str) -> Optional[Tuple[Any, float]]:
+        if self._db is None:
+            return None
+
+        pending = self._pending.get((namespace, key))
+        if pending is not None:
+            value, expires_at = pending
+        else:
+            self.reads += 1
+            row = self._db.execute(
+                "SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?",
+                (namespace, key),
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+
+        if expires_at <= time.time():
+            return None
+        return json.loads(value), expires_at
+
+    def put(self, namespace: str, key: str, value: Any, ttl: float):
+        if self._db is None:
+            return
+        self._pending[(namespace, key)] = (json.dumps(value), time.time() + ttl)
+
+    def flush(self):
+        if self._db is None or not self._pending:
+            return
+
+        pending, self._pending = self._pending, {}
+        rows = [
+            (namespace, key, value, expires_at)
+            for (namespace, key), (value, expires_at) in pending.items()
+        ]
+        try:
+            with self._db:
+                self._db.execute("BEGIN")
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO cache (namespace, key, value, expires_at)"
+                    " VALUES (?, ?, ?, ?)",
+                    rows,
+                )
+                self._db.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+            self.writes += len(rows)
+        except sqlite3.Error as ex:
+            logger.error(f"Error flushing persistent cache: {ex}")
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await asyncio.to_thread(self.flush)
+
+    def start(self):
+        self.open()
+        if self._db is not None and self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        if self._db is not None:
+            await asyncio.to_thread(self.flush)
+            self._db.close()
+            self._db = None
+            logger.info("Persistent cache closed")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "pending": len(self._pending),
+            "reads": self.reads,
+            "writes": self.writes,
+        }
@@ -0,0 +1,154 @@
+import math
+import time
+import heapq
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+from utils.logger import logger
+
+
+class DecayingCounter:
+    """Request counts per key that halve every `half_life` seconds.
+
+    Instead of decaying every score on every tick, each hit adds a weight
+    that grows exponentially with time, so older hits are worth less in
+    comparison and scores can be ranked as stored. Scores are rescaled
+    before the weights get too large for a float. Each key also keeps the
+    last payload it was hit with, e.g. what is needed to refresh it.
+    """
+
+    def __init__(self, half_life: float, max_keys: int = 10_000):
+        self.half_life = half_life
+        self.max_keys = max_keys
+        self._origin = time.monotonic()
+        self._scores: Dict[Hashable, float] = {}
+        self._payloads: Dict[Hashable, Any] = {}
+        self.hits = 0
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def _growth(self, now: float) -> float:
+        return (now - self._origin) / self.half_life
+
+    def hit(self, key: Hashable, payload: Any = None):
+        now = time.monotonic()
+        if self._growth(now) > 512:
+            self._rescale(now)
+        self.hits += 1
+        self._scores[key] = self._scores.get(key, 0.0) + 2 ** self._growth(now)
+        self._payloads[key] = payload
+        if len(self._scores) > self.max_keys * 1.25:
+            self._trim()
+
+    def score(self, key: Hashable) -> float:
+        """Decayed number of hits, as of now"""
+        return self._scores.get(key, 0.0) / 2 ** self._growth(time.monotonic())
+
+    def top(self, count: int, min_score: float = 0.0) -> List[Tuple[Hashable, Any, float]]:
+        """The `count` hottest keys with their payloads and current scores"""
+        scale = 2 ** self._growth(time.monotonic())
+        hottest = heapq.nlargest(count, self._scores.items(), key=lambda item: item[1])
+        return [
+            (key, self._payloads[key], score / scale)
+            for key, score in hottest
+            if score / scale >= min_score
+        ]
+
+    def _rescale(self, now: float):
+        factor = 2 ** self._growth(now)
+        self._scores = {
+            key: score / factor
+            for key, score in self._scores.items()
+            if score / factor > 1e-6
+        }
+        self._payloads = {key: self._payloads[key] for key in self._scores}
+        self._origin = now
+
+    def _trim(self):
+        kept = heapq.nlargest(self.max_keys, self._scores.items(), key=lambda item: item[1])
+        self._scores = dict(kept)
+        self._payloads = {key: self._payloads[key] for key in self._scores}
+
+    def stats(self) -> Dict[str, Any]:
+        hottest = self.top(1)
+        return {
+            "keys": len(self._scores),
+            "hits": self.hits,
+            "top_score": round(hottest[0][2], 2) if hottest else 0,
+        }
+
+
+class PrewarmScheduler:
+    """Keeps the most requested entries fresh before users ask for them.
+
+    Every `interval` seconds the hottest keys of `popularity` are passed
+    to `refresh`, which reloads whatever is about to expire. The hottest
+    `cards` of them are then passed to `prepare` once for the current
+    minute and once for the minute that starts before the next tick, so
+    output that depends on the clock is ready in time as well.
+    """
+
+    def __init__(
+        self,
+        popularity: DecayingCounter,
+        refresh: Callable[[List[Tuple[Hashable, Any, float]]], Awaitable[Any]],
+        prepare: Optional[Callable[[Hashable, Any, float], Awaitable[Any]]],
+        top: int,
+        cards: int,
+        interval: float,
+        min_score: float,
+    ):
+        self.popularity = popularity
+        self.refresh = refresh
+        self.prepare = prepare
+        self.top = top
+        self.cards = cards
+        self.interval = interval
+        self.min_score = min_score
+        self._task: asyncio.Task | None = None
+        self.ticks = 0
+        self.prepared = 0
+        self.errors = 0
+
+    async def tick(self):
+        self.ticks += 1
+        hottest = self.popularity.top(self.top, self.min_score)
+        if not hottest:
+            return
+        await self.refresh(hottest)
+
+        if self.prepare is None or self.cards <= 0:
+            return
+        now = time.time()
+        minutes = {math.floor(now / 60) * 60, math.floor((now + self.interval) / 60) * 60}
+        for key, payload, _ in hottest[:self.cards]:
+            for minute in sorted(minutes):
+                if await self.prepare(key, payload, max(now, minute)):
+                    self.prepared += 1
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.tick()
+            except Exception as ex:
+                self.errors += 1
+                logger.error(f"Error prewarming popular locations: {ex}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self.top > 0 and self._task is None:
+            self._task = asyncio.create_task(self._loop())
+            logger.info("Prewarm scheduler started")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ticks": self.ticks,
+            "prepared": self.prepared,
+            "errors": self.errors,
+        }
@@ -0,0 +1,116 @@
+import time
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable, Optional
+
+from utils.logger import logger
+from utils.settings import generate_random_ip
+from utils.weather import get_location
+
+
+class RandomLocation:
+    __slots__ = ("ip", "city", "country_code", "created_at", "prepared")
+
+    def __init__(self, ip: str, city: str, country_code: str, prepared: Any = None):
+        self.ip = ip
+        self.city = city
+        self.country_code = country_code
+        self.created_at = time.monotonic()
+        self.prepared = prepared
+
+
+class RandomLocationPool:
+    """Keeps resolved random locations ready for `random` queries.
+
+    A background task generates random IPs, resolves them and, if a
+    `prepare` coroutine is given, stores its result (e.g. the weather and
+    an uploaded card) with the entry. Lookups are paced so the pool never
+    spends more than `rate_per_minute` geolocation calls, and only happen
+    to replace popped entries, so an idle pool costs nothing. A location
+    does not go out of date, but its prepared result does: one older
+    than `max_age` is dropped when the entry is popped.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        rate_per_minute: float,
+        max_age: float,
+        prepare: Optional[Callable[[str, str], Awaitable[Any]]] = None,
+    ):
+        self.size = size
+        self.interval = 60 / rate_per_minute if rate_per_minute > 0 else 0
+        self.max_age = max_age
+        self.prepare = prepare
+        self._entries: deque[RandomLocation] = deque()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self.served = 0
+        self.empty = 0
+        self.expired = 0
+        self.lookups = 0
+        self.failed_lookups = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def pop(self) -> Optional[RandomLocation]:
+        self._wakeup.set()
+        if not self._entries:
+            self.empty += 1
+            return None
+
+        entry = self._entries.popleft()
+        self.served += 1
+        if entry.prepared is not None and time.monotonic() - entry.created_at >= self.max_age:
+            entry.prepared = None
+            self.expired += 1
+        return entry
+
+    async def _fill_one(self):
+        ip = generate_random_ip()
+        self.lookups += 1
+        city, country_code = await get_location(ip)
+        if not city:
+            self.failed_lookups += 1
+            return
+
+        prepared = None
+        if self.prepare is not None:
+            prepared = await self.prepare(city, country_code)
+            if prepared is None:
+                return
+        self._entries.append(RandomLocation(ip, city, country_code, prepared))
+
+    async def _refill_loop(self):
+        while True:
+            if len(self._entries) >= self.size:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            try:
+                await self._fill_one()
+            except Exception as ex:
+                logger.error(f"Error refilling random location pool: {ex}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self.size > 0 and self._task is None:
+            self._task = asyncio.create_task(self._refill_loop())
+            logger.info("Random location pool started")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "ready": len(self._entries),
+            "served": self.served,
+            "empty": self.empty,
+            "expired": self.expired,
+            "lookups": self.lookups,
+            "failed_lookups": self.failed_lookups,
+        }
@@ -0,0 +1,208 @@
+import os
+import time
+import asyncio
+import threading
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, List
+
+from config import (
+    RENDER_EXECUTOR,
+    RENDER_QUEUE_SIZE,
+    THREAD_POOL_WORKERS,
+)
+from utils.logger import logger
+from utils.metrics import register_stats
+
+
+def _init_worker():
+    # Spawned workers already loaded everything when importing utils.image;
+    # this only matters if a worker starts with an empty module state
+    from utils import image
+
+    if image.FONT_LARGE is None:
+        image.load_resources()
+
+
+def _noop() -> str:
+    return _worker_name()
+
+
+def _worker_name() -> str:
+    return f"{os.getpid()}:{threading.current_thread().name}"
+
+
+def _render_job(
+    weather_data: Dict[str, Any]
+) -> tuple[str, bytes | None, Dict[str, float]]:
+    from utils.image import draw_weather_card, encode_card
+
+    start_time = time.perf_counter()
+    card_bytes = None
+    encode_time = 0.0
+
+    main_img = draw_weather_card(weather_data)
+    draw_time = time.perf_counter() - start_time
+    if main_img is not None:
+        try:
+            card_bytes, encode_time = encode_card(main_img)
+        except Exception:
+            logger.error("Error encoding weather card")
+
+    timings = {"draw": draw_time, "encode": encode_time}
+    return _worker_name(), card_bytes, timings
+
+
+def _render_batch_job(
+    batch: List[Dict[str, Any]]
+) -> tuple[str, List[bytes | None], Dict[str, Any]]:
+    from utils.image import draw_weather_card, encode_cards
+
+    start_time = time.perf_counter()
+    images = [draw_weather_card(weather_data) for weather_data in batch]
+    draw_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    encoded = encode_cards(images)
+    encode_time = time.perf_counter() - start_time
+
+    timings = {
+        "draw": draw_time,
+        "encode": encode_time,
+        "encode_each": [elapsed for _, elapsed in encoded],
+    }
+    return _worker_name(), [card_bytes for card_bytes, _ in encoded], timings
+
+
+class RenderQueueFull(RuntimeError):
+    pass
+
+
+class RenderExecutor:
+    """Runs card rendering in a thread or process pool with a bounded queue"""
+
+    def __init__(self, mode: str, workers: int, queue_size: int):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Unknown render executor mode: {mode}")
+
+        self.mode = mode
+        self.workers = workers
+        self.max_pending = workers + queue_size
+        self.pending = 0
+        self.submitted = 0
+        self.rejected = 0
+        self.worker_stats: Dict[str, Dict[str, float]] = {}
+        self._executor: Executor | None = None
+
+    @property
+    def started(self) -> bool:
+        return self._executor is not None
+
+    def start(self):
+        if self._executor is not None:
+            return
+
+        if self.mode == "process":
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+        else:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers,
+                thread_name_prefix="render",
+            )
+        logger.info(f"Render executor started ({self.mode}, {self.workers} workers)")
+
+    async def warm_up(self):
+        """Start every worker up front instead of on the first queries"""
+        self.start()
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(
+            loop.run_in_executor(self._executor, _noop)
+            for _ in range(self.workers)
+        ))
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            logger.info("Render executor stopped")
+
+    async def _submit(self, job, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise RenderQueueFull("Render queue is full")
+
+        self.start()
+        loop = asyncio.get_running_loop()
+        future = self._executor.submit(job, *args)
+        self.pending += 1
+        self.submitted += 1
+        # A cancelled caller does not stop a job that is already running,
+        # so the job stays counted until the executor is done with it
+        future.add_done_callback(lambda _: self._job_done(loop))
+        return await asyncio.wrap_future(future)
+
+    def _job_done(self, loop: asyncio.AbstractEventLoop):
+        # Called from a worker or executor thread
+        try:
+            loop.call_soon_threadsafe(self._release)
+        except RuntimeError:
+            # The loop is already closed
+            pass
+
+    def _release(self):
+        self.pending -= 1
+
+    def _record(self, worker: str, cards: int, failures: int, busy_seconds: float):
+        stats = self.worker_stats.setdefault(
+            worker, {"cards": 0, "failures": 0, "busy_seconds": 0.0}
+        )
+        stats["cards"] += cards
+        stats["failures"] += failures
+        stats["busy_seconds"] += busy_seconds
+
+    async def render(
+        self, weather_data: Dict[str, Any]
+    ) -> tuple[bytes | None, Dict[str, float]]:
+        worker, card_bytes, timings = await self._submit(_render_job, weather_data)
+        rendered = card_bytes is not None
+        self._record(worker, int(rendered), int(not rendered), timings["draw"] + timings["encode"])
+        return card_bytes, timings
+
+    async def render_batch(
+        self, batch: List[Dict[str, Any]]
+    ) -> tuple[List[bytes | None], Dict[str, Any]]:
+        """Render several cards as one job, taking one place in the queue"""
+        worker, cards, timings = await self._submit(_render_batch_job, batch)
+        rendered = sum(card_bytes is not None for card_bytes in cards)
+        self._record(worker, rendered, len(cards) - rendered, timings["draw"] + timings["encode"])
+        return cards, timings
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "workers": self.workers,
+            "pending": self.pending,
+            "submitted": self.submitted,
+            "rejected": self.rejected,
+            "per_worker": self.worker_stats,
+        }
+
+
+render_executor = RenderExecutor(
+    RENDER_EXECUTOR, THREAD_POOL_WORKERS, RENDER_QUEUE_SIZE
+)
+
+
+register_stats("weather_render", render_executor.stats)
+
+
+async def start_render_executor():
+    await render_executor.warm_up()
+
+
+async def stop_render_executor():
+    render_executor.shutdown()
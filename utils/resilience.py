@@ -0,0 +1,120 @@
+import time
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Type
+
+from utils.logger import logger
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """Stops calling an upstream that keeps failing.
+
+    After `failure_threshold` consecutive failures the circuit opens and
+    allow() refuses calls for `reset_timeout` seconds. Then a single trial
+    call is let through: success closes the circuit, failure opens it
+    again. open_for() opens it for a given time, e.g. when an upstream
+    says when to retry.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self._opened_until = 0.0
+        self._trial_started: float | None = None
+        self.opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self.failures < self.failure_threshold and not self._opened_until:
+            return "closed"
+        if time.monotonic() < self._opened_until:
+            return "open"
+        return "half_open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        now = time.monotonic()
+        # A trial whose caller never reported back (e.g. it was cancelled)
+        # does not keep the circuit half-open forever
+        if state == "half_open" and (
+            self._trial_started is None or now - self._trial_started > self.reset_timeout
+        ):
+            self._trial_started = now
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self._opened_until = 0.0
+        self._trial_started = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self._trial_started is not None or self.failures >= self.failure_threshold:
+            self.open_for(self.reset_timeout)
+
+    def open_for(self, seconds: float):
+        if self.state != "open":
+            self.opened += 1
+            logger.warning(f"Circuit {self.name} opened for {seconds:g} s")
+        self._opened_until = max(self._opened_until, time.monotonic() + seconds)
+        self._trial_started = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "open": self.state != "closed",
+            "consecutive_failures": self.failures,
+            "opened": self.opened,
+            "rejected": self.rejected,
+        }
+
+
+async def hedged(
+    attempt: Callable[[], Awaitable[Any]],
+    hedge_after: float,
+    on_retry: Optional[Callable[[bool], None]] = None,
+    final: Tuple[Type[BaseException], ...] = (),
+) -> Any:
+    """Run attempt() with one spare: a second attempt starts when the first
+    fails, or, if `hedge_after` is set, when the first is still running
+    after that many seconds. The first success wins and the other attempt
+    is cancelled; if both fail the last error is raised.
+
+    on_retry(hedge) is called when the second attempt starts, with hedge
+    telling whether it was started because the first was slow. Errors
+    of the `final` types are raised at once, without another attempt.
+    """
+    tasks = {asyncio.ensure_future(attempt())}
+    retried = False
+    error: BaseException | None = None
+    try:
+        while tasks:
+            timeout = hedge_after if not retried and hedge_after > 0 else None
+            done, tasks = await asyncio.wait(
+                tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+                if isinstance(error, final):
+                    raise error
+
+            if not retried and (not done or not tasks):
+                retried = True
+                if on_retry is not None:
+                    on_retry(not done)
+                tasks.add(asyncio.ensure_future(attempt()))
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
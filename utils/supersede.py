@@ -0,0 +1,69 @@
+import time
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from utils.cache import TTLCache
+from utils.logger import logger
+
+
+SUPERSEDED = object()
+
+
+class LatestOnly:
+    """Keeps only the newest call per key running.
+
+    Starting a call for a key cancels the previous one that is still in
+    flight, which then returns SUPERSEDED instead of its result. The time
+    of the last call per key is remembered so callers can tell when
+    requests come in quick succession, e.g. a user typing.
+    """
+
+    def __init__(self, name: str, remember: float = 60, max_keys: int = 100_000):
+        self.name = name
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+        self._last_seen = TTLCache(f"{name}_last_seen", ttl=remember, max_entries=max_keys)
+        self.started = 0
+        self.superseded = 0
+
+    def since_last(self, key: Hashable) -> float:
+        """Seconds since the previous call for key, infinity if unknown"""
+        last_seen = self._last_seen.get(key, count=False)
+        return time.monotonic() - last_seen if last_seen is not None else float("inf")
+
+    async def run(
+        self,
+        key: Hashable,
+        func: Callable[..., Awaitable[Any]],
+        *args: Any,
+        **kwargs: Any,
+    ) -> Any:
+        previous = self._tasks.get(key)
+        if previous is not None and not previous.done():
+            previous.cancel()
+            self.superseded += 1
+            logger.debug(f"Newer {self.name} call superseded an older one")
+
+        self.started += 1
+        task = asyncio.ensure_future(func(*args, **kwargs))
+        self._tasks[key] = task
+        self._last_seen.set(key, time.monotonic())
+        try:
+            # wait() does not raise when the task is cancelled, only when we are
+            await asyncio.wait((task,))
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+        finally:
+            if self._tasks.get(key) is task:
+                del self._tasks[key]
+
+        if task.cancelled():
+            return SUPERSEDED
+        return task.result()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": len(self._tasks),
+            "started": self.started,
+            "superseded": self.superseded,
+        }
@@ -0,0 +1,303 @@
+import time
+import asyncio
+from abc import ABC, abstractmethod
+from io import BytesIO
+from typing import Any, Dict, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.types import BufferedInputFile
+
+from config import (
+    BOT_MODE,
+    CARD_UPLOAD,
+    IMAGE_PUBLIC_URL,
+    IMAGE_SERVER_HOST,
+    IMAGE_SERVER_PORT,
+    IMAGE_STORE_MAX_BYTES,
+    IMAGE_STORE_PATH,
+    IMGBB_API_KEY,
+    STORAGE_CHAT_ID,
+    UPLOAD_BREAKER_FAILURES,
+    UPLOAD_BREAKER_RESET,
+    UPLOAD_FALLBACK,
+    UPLOAD_HEDGE_AFTER,
+    UPLOAD_TIMEOUT,
+    WEBHOOK_WORKERS,
+)
+from utils.http import get_client
+from utils.image_server import DiskImageStore, ImageServer, MemoryImageStore
+from utils.logger import logger
+from utils.metrics import STAGE_SECONDS, UPLOAD_SECONDS, register_stats
+from utils.resilience import CircuitBreaker, hedged
+
+
+def is_file_id(ref: str) -> bool:
+    """Whether an uploaded card reference is a Telegram file_id rather than a URL"""
+    return not ref.startswith(("http://", "https://"))
+
+
+class UploadError(Exception):
+    pass
+
+
+class UploadThrottled(UploadError):
+    def __init__(self, retry_after: float):
+        super().__init__(f"Retry after {retry_after} s")
+        self.retry_after = retry_after
+
+
+class CardUploader(ABC):
+    """Stores rendered cards somewhere an inline result can point to.
+
+    send() returns a reference to the card, either a public URL for
+    InlineQueryResultPhoto or a Telegram file_id for
+    InlineQueryResultCachedPhoto (see is_file_id), and raises on failure.
+    """
+
+    name = "none"
+
+    def __init__(self):
+        self.uploads = 0
+        self.uploaded_bytes = 0
+        self.errors = 0
+        self.timeouts = 0
+
+    def bind(self, bot: Bot):
+        pass
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    @abstractmethod
+    async def send(self, data: bytes, filename: str) -> str:
+        """Store one card and return its reference"""
+
+    async def attempt(self, data: bytes, filename: str, timeout: float) -> str:
+        """One send() bounded by `timeout`, recorded in this backend's stats"""
+        start_time = time.perf_counter()
+        outcome = "error"
+        try:
+            ref = await asyncio.wait_for(self.send(data, filename), timeout)
+            outcome = "ok"
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            outcome = "timeout"
+            raise
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            UPLOAD_SECONDS.observe(
+                time.perf_counter() - start_time, backend=self.name, outcome=outcome
+            )
+        self.uploads += 1
+        self.uploaded_bytes += len(data)
+        return ref
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "uploads": self.uploads,
+            "uploaded_bytes": self.uploaded_bytes,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+        }
+
+
+class ImgbbUploader(CardUploader):
+    name = "imgbb"
+
+    async def send(self, data: bytes, filename: str) -> str:
+        client = get_client("imgbb")
+        response = await client.post(
+            "/1/upload", data=dict(key=IMGBB_API_KEY), files=dict(image=(filename, data))
+        )
+        if response.status_code != 200:
+            raise UploadError(f"imgbb answered {response.status_code}")
+        return response.json()["data"]["url"]
+
+
+class TelegramUploader(CardUploader):
+    """Sends cards to a storage chat once and answers with their file_id"""
+
+    name = "telegram"
+
+    def __init__(self, chat_id: str):
+        super().__init__()
+        self.chat_id = chat_id
+        self.bot: Bot | None = None
+
+    def bind(self, bot: Bot):
+        self.bot = bot
+
+    async def send(self, data: bytes, filename: str) -> str:
+        if self.bot is None:
+            raise UploadError("No bot to upload with")
+        try:
+            message = await self.bot.send_photo(
+                chat_id=self.chat_id,
+                photo=BufferedInputFile(data, filename=filename),
+                disable_notification=True,
+            )
+        except TelegramRetryAfter as ex:
+            # Telegram limits how fast a bot may post to one chat
+            raise UploadThrottled(ex.retry_after)
+        if not message.photo:
+            raise UploadError("Storage chat message has no photo")
+        return message.photo[-1].file_id
+
+
+class LocalUploader(CardUploader):
+    """Keeps cards in the built-in image server; nothing leaves the host"""
+
+    name = "local"
+
+    def __init__(self, server: ImageServer):
+        super().__init__()
+        self.server = server
+
+    async def start(self):
+        await self.server.start()
+
+    async def stop(self):
+        await self.server.stop()
+
+    async def send(self, data: bytes, filename: str) -> str:
+        return await self.server.store_card(data, filename.rpartition(".")[2])
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), **self.server.stats()}
+
+
+class ResilientUploader:
+    """Uploads through a primary backend, guarded, with an optional alternate.
+
+    Every attempt has its own UPLOAD_TIMEOUT deadline. A second attempt
+    starts when the first fails or is still running after `hedge_after`
+    seconds. While the primary's circuit breaker is open, or when both
+    attempts fail, the card goes to the alternate backend; if that fails
+    too, upload() returns None and the caller answers without a card.
+    """
+
+    def __init__(
+        self,
+        primary: CardUploader,
+        alternate: Optional[CardUploader],
+        breaker: CircuitBreaker,
+        timeout: float,
+        hedge_after: float,
+    ):
+        self.primary = primary
+        self.alternate = alternate
+        self.breaker = breaker
+        self.timeout = timeout
+        self.hedge_after = hedge_after
+        self.retries = 0
+        self.hedges = 0
+        self.fallbacks = 0
+        self.failed = 0
+
+    @property
+    def backends(self) -> list:
+        return [self.primary] + ([self.alternate] if self.alternate is not None else [])
+
+    def bind(self, bot: Bot):
+        for backend in self.backends:
+            backend.bind(bot)
+
+    async def start(self):
+        for backend in self.backends:
+            await backend.start()
+
+    async def stop(self):
+        for backend in self.backends:
+            await backend.stop()
+
+    def _count_retry(self, hedge: bool):
+        if hedge:
+            self.hedges += 1
+        else:
+            self.retries += 1
+
+    async def upload(self, card_io: BytesIO, filename: str) -> Optional[str]:
+        data = card_io.getvalue()
+        with STAGE_SECONDS.time(stage="upload"):
+            if self.breaker.allow():
+                try:
+                    ref = await hedged(
+                        lambda: self.primary.attempt(data, filename, self.timeout),
+                        self.hedge_after,
+                        self._count_retry,
+                        final=(UploadThrottled,),
+                    )
+                    self.breaker.record_success()
+                    return ref
+                except UploadThrottled as ex:
+                    self.breaker.open_for(ex.retry_after)
+                except Exception as ex:
+                    self.breaker.record_failure()
+                    logger.error(f"Error uploading card to {self.primary.name}: {ex!r}")
+
+            if self.alternate is not None:
+                self.fallbacks += 1
+                try:
+                    return await self.alternate.attempt(data, filename, self.timeout)
+                except Exception as ex:
+                    logger.error(f"Error uploading card to {self.alternate.name}: {ex!r}")
+
+        self.failed += 1
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "fallbacks": self.fallbacks,
+            "failed": self.failed,
+            **{f"breaker_{key}": value for key, value in self.breaker.stats().items()},
+            "backends": {backend.name: backend.stats() for backend in self.backends},
+        }
+
+
+def create_card_uploader(kind: str) -> CardUploader:
+    if kind == "imgbb":
+        return ImgbbUploader()
+    if kind == "telegram":
+        return TelegramUploader(STORAGE_CHAT_ID)
+    if kind == "local":
+        if IMAGE_STORE_PATH:
+            store = DiskImageStore(IMAGE_STORE_PATH, IMAGE_STORE_MAX_BYTES)
+        else:
+            store = MemoryImageStore(IMAGE_STORE_MAX_BYTES)
+        # Webhook workers all listen on the port and share the store directory
+        shared_port = BOT_MODE == "webhook" and WEBHOOK_WORKERS > 1
+        server = ImageServer(
+            store, IMAGE_SERVER_HOST, IMAGE_SERVER_PORT, IMAGE_PUBLIC_URL, reuse_port=shared_port
+        )
+        return LocalUploader(server)
+    raise ValueError(f"Unknown card upload backend: {kind}")
+
+
+card_uploader = ResilientUploader(
+    create_card_uploader(CARD_UPLOAD),
+    create_card_uploader(UPLOAD_FALLBACK) if UPLOAD_FALLBACK else None,
+    CircuitBreaker(f"upload_{CARD_UPLOAD}", UPLOAD_BREAKER_FAILURES, UPLOAD_BREAKER_RESET),
+    timeout=UPLOAD_TIMEOUT,
+    hedge_after=UPLOAD_HEDGE_AFTER,
+)
+register_stats("weather_card_uploader", card_uploader.stats)
+
+
+async def start_card_uploader(bot: Bot):
+    card_uploader.bind(bot)
+    await card_uploader.start()
+
+
+async def stop_card_uploader():
+    await card_uploader.stop()
@@ -1,18 +1,123 @@
+import time
 import httpx
+import asyncio
 from datetime import datetime, timezone, timedelta
 import re
 from typing import Any, Dict, Tuple, Optional
 
 from config import (
     CACHE_TTL,
-    OPENWEATHERMAP_BASE_URL,
+    LOCATION_CACHE_SIZE,
+    LOCATION_CACHE_TTL,
     OPENWEATHERMAP_API_KEY,
-    REQUEST_TIMEOUT,
+    OWM_BREAKER_FAILURES,
+    OWM_BREAKER_RESET,
+    PREWARM_HALF_LIFE,
+    PREWARM_LEAD,
+    WEATHER_CACHE_MAX_BYTES,
+    WEATHER_CACHE_SIZE,
+    WEATHER_STALE_TTL,
 )
+from utils.cache import TTLCache
+from utils.cache_backend import TieredCache
+from utils.gazetteer import City, gazetteer, normalize_name
+from utils.geo import geo_database, ip_prefix
+from utils.http import get_client
 from utils.logger import logger
+from utils.metrics import STAGE_SECONDS, register_stats
+from utils.prewarm import DecayingCounter
+from utils.resilience import CircuitBreaker, CircuitOpenError
+from utils.singleflight import SingleFlight
+
+
+class WeatherRecord:
+    """Language-neutral weather of one location, as cached and shared.
+
+    Everything shown to the user (translated description, wind direction
+    letters, local sunrise/sunset and current time) is derived from it
+    by present_weather.
+    """
+
+    __slots__ = (
+        "city", "country", "temp", "feels_like", "humidity", "pressure",
+        "wind_speed", "wind_deg", "condition_id", "description",
+        "sunrise", "sunset", "timezone_offset", "owm_id", "fetched_at",
+    )
+
+    @classmethod
+    def from_list(cls, values: list) -> "WeatherRecord":
+        record = cls()
+        record.owm_id = None
+        record.fetched_at = 0
+        for name, value in zip(cls.__slots__, values):
+            setattr(record, name, value)
+        return record
+
+    def to_list(self) -> list:
+        return [getattr(self, name) for name in self.__slots__]
+
+    @property
+    def stale(self) -> bool:
+        return time.time() - self.fetched_at >= CACHE_TTL
+
+
+class WeatherUnavailable(Exception):
+    """OpenWeatherMap failed and there is no cached weather to fall back on"""
+
+
+# Keyed on location_key(); the name is also the shared backend namespace.
+# Entries are fresh for CACHE_TTL and kept WEATHER_STALE_TTL longer for outages.
+weather_cache = TieredCache(
+    TTLCache(
+        "weather_record",
+        ttl=CACHE_TTL + WEATHER_STALE_TTL,
+        max_entries=WEATHER_CACHE_SIZE,
+        max_bytes=WEATHER_CACHE_MAX_BYTES,
+    ),
+    encode=WeatherRecord.to_list,
+    decode=WeatherRecord.from_list,
+)
+location_cache = TieredCache(
+    TTLCache("location", ttl=LOCATION_CACHE_TTL, max_entries=LOCATION_CACHE_SIZE),
+    encode=list,
+    decode=tuple,
+)
+
+# OpenWeatherMap names places in English; names in the other languages
+# of places missing from the gazetteer come from its geocoding API
+LOCAL_NAME_LANGS = ("ru",)
+city_names = TieredCache(
+    TTLCache("city_names", ttl=LOCATION_CACHE_TTL, max_entries=LOCATION_CACHE_SIZE)
+)
+
+register_stats("weather_cache", weather_cache.stats)
+register_stats("weather_location_cache", location_cache.stats)
+register_stats("weather_city_names", city_names.stats)
+register_stats("weather_geo_database", geo_database.stats)
+
+# Concurrent misses for one location share a single upstream call
+weather_flight = SingleFlight("weather")
+register_stats("weather_upstream_flight", weather_flight.stats)
+
+# Calls fail fast while OpenWeatherMap is down, stale weather is served instead
+owm_breaker = CircuitBreaker("openweathermap", OWM_BREAKER_FAILURES, OWM_BREAKER_RESET)
+register_stats("weather_owm_breaker", owm_breaker.stats)
 
+# Background refreshes of stale entries, kept so they are not garbage collected
+_revalidations: set = set()
 
-weather_cache = {}
+# Queries per (location key, language), for keeping hot locations fresh
+weather_popularity = DecayingCounter(half_life=PREWARM_HALF_LIFE)
+register_stats("weather_popularity", weather_popularity.stats)
+
+# OpenWeatherMap's group endpoint accepts up to 20 city ids per call
+GROUP_SIZE = 20
+
+
+async def start_weather_cache():
+    """Warm the in-memory caches from the cache backend"""
+    for cache in (weather_cache, location_cache, city_names):
+        await cache.warm()
 
 
 def detect_language(text: str) -> str:
@@ -31,15 +136,32 @@ def wind_direction(deg: float) -> str:
 
 
 async def get_location(ip: str) -> Tuple[Optional[str], Optional[str]]:
-    try:
-        timeout = httpx.Timeout(REQUEST_TIMEOUT)
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            response = await client.get(f"http://ip-api.com/json/{ip}")
-            data = response.json()
+    """Offline range table first, then the per-network cache, then ip-api"""
+    location = geo_database.lookup(ip)
+    if location is not None:
+        logger.debug("Offline geo database used")
+        return location
+
+    prefix = ip_prefix(ip)
+    if prefix is None:
+        return None, None
+
+    cached = await location_cache.get(prefix)
+    if cached is not None:
+        logger.debug("Cached location used")
+        return cached
 
-            if data["status"] == "success":
-                return data["city"], data["countryCode"]
-            return None, None
+    try:
+        client = get_client("ip-api")
+        with STAGE_SECONDS.time(stage="ip-api"):
+            response = await client.get(f"/json/{ip}")
+        data = response.json()
+
+        if data["status"] == "success":
+            location = data["city"], data["countryCode"]
+            location_cache.set(prefix, location)
+            return location
+        return None, None
 
     except httpx.HTTPError as ex:
         logger.error("HTTP error getting location for IP")
@@ -89,109 +211,395 @@ def get_description(description: str, target_lang: str = "en") -> str:
     return description.capitalize()
 
 
-def parse_weather_response(data: Dict[str, Any], lang: str = "en") -> Optional[Dict[str, Any]]:
-    if data.get("cod") != 200:
-        return None
-
+# OpenWeatherMap condition ids (openweathermap.org/weather-conditions) in Russian
+CONDITIONS_RU = {
+    200: "гроза с небольшим дождём",
+    201: "гроза с дождём",
+    202: "гроза с сильным дождём",
+    210: "слабая гроза",
+    211: "гроза",
+    212: "сильная гроза",
+    221: "местами гроза",
+    230: "гроза с мелкой моросью",
+    231: "гроза с моросью",
+    232: "гроза с сильной моросью",
+    300: "слабая морось",
+    301: "морось",
+    302: "сильная морось",
+    310: "слабый моросящий дождь",
+    311: "моросящий дождь",
+    312: "сильный моросящий дождь",
+    313: "ливень с моросью",
+    314: "сильный ливень с моросью",
+    321: "ливневая морось",
+    500: "небольшой дождь",
+    501: "умеренный дождь",
+    502: "сильный дождь",
+    503: "очень сильный дождь",
+    504: "проливной дождь",
+    511: "ледяной дождь",
+    520: "небольшой ливень",
+    521: "ливень",
+    522: "сильный ливень",
+    531: "местами ливень",
+    600: "небольшой снег",
+    601: "снег",
+    602: "сильный снег",
+    611: "мокрый снег",
+    612: "небольшой мокрый снег",
+    613: "ливневый мокрый снег",
+    615: "небольшой дождь со снегом",
+    616: "дождь со снегом",
+    620: "небольшой снегопад",
+    621: "снегопад",
+    622: "сильный снегопад",
+    701: "туман",
+    711: "дым",
+    721: "мгла",
+    731: "песчаные вихри",
+    741: "туман",
+    751: "песок",
+    761: "пыль",
+    762: "вулканический пепел",
+    771: "шквалы",
+    781: "торнадо",
+    800: "ясно",
+    801: "небольшая облачность",
+    802: "переменная облачность",
+    803: "облачно с прояснениями",
+    804: "пасмурно",
+}
+
+WIND_DIRECTIONS_RU = {
+    "N": "С", "NE": "СВ", "E": "В", "SE": "ЮВ",
+    "S": "Ю", "SW": "ЮЗ", "W": "З", "NW": "СЗ"
+}
+
+
+def parse_weather_record(data: Dict[str, Any]) -> Optional[WeatherRecord]:
+    """Language-neutral record from an OpenWeatherMap weather object"""
     main = data["main"]
     weather = data["weather"][0]
     wind = data["wind"]
     sys = data["sys"]
 
-    timezone_offset = data.get("timezone", 0)
-    sunrise_utc = sys["sunrise"]
-    sunset_utc = sys["sunset"]
+    record = WeatherRecord()
+    record.city = data["name"]
+    record.country = sys["country"]
+    record.temp = main["temp"]
+    record.feels_like = main["feels_like"]
+    record.humidity = main["humidity"]
+    record.pressure = round(main["pressure"] * 0.750062)
+    record.wind_speed = wind["speed"]
+    record.wind_deg = wind.get("deg")
+    record.condition_id = weather.get("id")
+    record.description = weather["description"]
+    record.sunrise = sys["sunrise"]
+    record.sunset = sys["sunset"]
+    record.timezone_offset = data.get("timezone", 0)
+    record.owm_id = data.get("id")
+    record.fetched_at = time.time()
+    return record
+
+
+def present_weather(
+    record: WeatherRecord,
+    lang: str = "en",
+    city_name: Optional[str] = None,
+    at: Optional[float] = None,
+) -> Dict[str, Any]:
+    """The weather_data dict the handlers and card renderer use, in one language.
+
+    `at` is the unix time the local clock on the card shows, now by default.
+    """
+    timezone_offset = record.timezone_offset
+    local_zone = timezone(timedelta(seconds=timezone_offset))
+
+    if lang == "ru" and record.condition_id in CONDITIONS_RU:
+        description = CONDITIONS_RU[record.condition_id].capitalize()
+    else:
+        description = get_description(record.description, target_lang=lang)
+
+    wind_dir = wind_direction(record.wind_deg) if record.wind_deg is not None else "N/A"
+    if lang == "ru" and wind_dir in WIND_DIRECTIONS_RU:
+        wind_dir = WIND_DIRECTIONS_RU[wind_dir]
+
+    return {
+        "city": city_name or record.city,
+        "country": record.country,
+        "temp": record.temp,
+        "feels_like": record.feels_like,
+        "humidity": record.humidity,
+        "pressure": record.pressure,
+        "wind_speed": record.wind_speed,
+        "wind_dir": wind_dir,
+        "description": description,
+        "sunrise": datetime.fromtimestamp(record.sunrise, local_zone).strftime("%H:%M"),
+        "sunset": datetime.fromtimestamp(record.sunset, local_zone).strftime("%H:%M"),
+        "timezone_offset": timezone_offset,
+        "stale": record.stale,
+        "updated_minutes_ago": int((time.time() - record.fetched_at) // 60),
+        "current_time_local": (
+            datetime.fromtimestamp(at if at is not None else time.time(), timezone.utc)
+            + timedelta(seconds=timezone_offset)
+        ),
+        "lang": lang,
+    }
 
-    sunrise_local = sunrise_utc + timezone_offset
-    sunset_local = sunset_utc + timezone_offset
 
-    sunrise_str = datetime.fromtimestamp(sunrise_local).strftime("%H:%M")
-    sunset_str = datetime.fromtimestamp(sunset_local).strftime("%H:%M")
+def parse_weather_response(data: Dict[str, Any], lang: str = "en") -> Optional[Dict[str, Any]]:
+    if data.get("cod") != 200:
+        return None
+    record = parse_weather_record(data)
 
-    current_time_utc = datetime.now(timezone.utc)
-    current_time_local = current_time_utc + timedelta(seconds=timezone_offset)
+    logger.debug("Weather received")
+    return present_weather(record, lang)
 
-    description = weather["description"]
 
-    if lang != "en": 
-        description = get_description(description, target_lang=lang)
-    elif lang == "en": 
-        description = get_description(description, target_lang="en")
+def location_key(city: str, country_code: Optional[str], place: Optional[City]) -> str:
+    """One cache key per place however it is spelled or in whatever language"""
+    if place is not None:
+        return place.id
+    return f"{normalize_name(city)}|{(country_code or '').upper()}"
 
-    wind_dir_translations = {
-        "N": "С", "NE": "СВ", "E": "В", "SE": "ЮВ",
-        "S": "Ю", "SW": "ЮЗ", "W": "З", "NW": "СЗ"
-    }
-    
-    wind_dir = wind_direction(wind["deg"]) if 'deg' in wind else "N/A"
-    if lang == "ru" and wind_dir in wind_dir_translations:
-        wind_dir = wind_dir_translations[wind_dir]
-
-    result = {
-        "city": data["name"],
-        "country": sys["country"],
-        "temp": main["temp"],
-        "feels_like": main["feels_like"],
-        "humidity": main["humidity"],
-        "pressure": round(main["pressure"] * 0.750062),
-        "wind_speed": wind["speed"],
-        "wind_dir": wind_dir,
-        "description": description,
-        "sunrise": sunrise_str,
-        "sunset": sunset_str,
-        "timezone_offset": timezone_offset,
-        "current_time_local": current_time_local,
-        "lang": lang,
+
+async def _fetch_weather_record(
+    city: str, country_code: Optional[str], place: Optional[City]
+) -> Optional[WeatherRecord]:
+    if place is not None:
+        location_params = {"lat": place.lat, "lon": place.lon}
+    else:
+        location_params = {"q": f"{city},{country_code}" if country_code else city}
+
+    params = {
+        **location_params,
+        "units": "metric",
+        "APPID": OPENWEATHERMAP_API_KEY,
+        "lang": "en",
     }
+    with STAGE_SECONDS.time(stage="openweathermap"):
+        response = await _call_openweathermap("/data/2.5/weather", params)
+    logger.debug("Received response from openweathermap")
+    data = response.json()
+    if data.get("cod") != 200:
+        return None
+    return parse_weather_record(data)
 
-    logger.debug("Weather received")
-    return result
+
+async def _call_openweathermap(path: str, params: Dict[str, Any]) -> httpx.Response:
+    """GET through the circuit breaker; an unknown city is not a failure"""
+    if not owm_breaker.allow():
+        raise CircuitOpenError("OpenWeatherMap circuit is open")
+    try:
+        response = await get_client("openweathermap").get(path, params=params)
+        if response.status_code != 404:
+            response.raise_for_status()
+    except Exception:
+        owm_breaker.record_failure()
+        raise
+    owm_breaker.record_success()
+    return response
+
+
+async def _load_weather_record(
+    cache_key: str, city: str, country_code: Optional[str], place: Optional[City]
+) -> Optional[WeatherRecord]:
+    record = await _fetch_weather_record(city, country_code, place)
+    if record is not None:
+        weather_cache.set(cache_key, record)
+    return record
+
+
+async def _fetch_weather_group(owm_ids: list) -> Dict[int, WeatherRecord]:
+    params = {
+        "id": ",".join(str(owm_id) for owm_id in owm_ids),
+        "units": "metric",
+        "APPID": OPENWEATHERMAP_API_KEY,
+        "lang": "en",
+    }
+    with STAGE_SECONDS.time(stage="openweathermap_group"):
+        response = await _call_openweathermap("/data/2.5/group", params)
+
+    records = {}
+    for item in response.json().get("list", []):
+        record = parse_weather_record(item)
+        if record.owm_id is not None:
+            records[record.owm_id] = record
+    return records
+
+
+async def refresh_weather(hottest: list) -> int:
+    """Reload hot locations whose weather expires within PREWARM_LEAD seconds.
+
+    `hottest` holds weather_popularity entries. Locations whose
+    OpenWeatherMap city id is known are reloaded in group calls of up to
+    GROUP_SIZE cities, the rest one by one. Returns how many were reloaded.
+    """
+    if owm_breaker.state == "open":
+        return 0
+
+    due = {}
+    for (cache_key, _), (city, country_code, place), _ in hottest:
+        if cache_key in due:
+            continue
+        # Entries outlive their freshness by WEATHER_STALE_TTL
+        remaining = weather_cache.local.expires_in(cache_key)
+        if remaining is not None and remaining - WEATHER_STALE_TTL > PREWARM_LEAD:
+            continue
+        # Another process sharing the cache backend may have reloaded it already
+        remaining = await weather_cache.expires_in(cache_key)
+        if remaining is None or remaining - WEATHER_STALE_TTL <= PREWARM_LEAD:
+            due[cache_key] = city, country_code, place
+
+    by_owm_id: Dict[int, list] = {}
+    one_by_one = []
+    for cache_key, target in due.items():
+        record = weather_cache.local.get(cache_key, count=False)
+        if record is not None and record.owm_id is not None:
+            by_owm_id.setdefault(record.owm_id, []).append(cache_key)
+        else:
+            one_by_one.append((cache_key, target))
+
+    refreshed = 0
+    owm_ids = list(by_owm_id)
+    for start in range(0, len(owm_ids), GROUP_SIZE):
+        chunk = owm_ids[start:start + GROUP_SIZE]
+        try:
+            records = await _fetch_weather_group(chunk)
+        except Exception as ex:
+            logger.error("Error getting weather for a group of cities")
+            records = {}
+        for owm_id in chunk:
+            record = records.get(owm_id)
+            for cache_key in by_owm_id[owm_id]:
+                if record is None:
+                    one_by_one.append((cache_key, due[cache_key]))
+                    continue
+                weather_cache.set(cache_key, record)
+                refreshed += 1
+
+    for cache_key, (city, country_code, place) in one_by_one:
+        try:
+            record = await weather_flight.do(
+                cache_key, _load_weather_record, cache_key, city, country_code, place
+            )
+        except Exception as ex:
+            logger.error("Error getting weather")
+            continue
+        if record is not None:
+            refreshed += 1
+
+    if refreshed:
+        logger.debug(f"Prewarmed weather for {refreshed} popular locations")
+    return refreshed
 
 
 async def fetch_weather_data(
     city: str, 
     country_code: Optional[str] = None, 
-    lang: str = "en"
+    lang: str = "en",
+    place: Optional[City] = None,
 ) -> Optional[Dict[str, Any]]:
-    cache_key = f"{city}_{country_code}_{lang}" if country_code else f"{city}_{lang}"
-
-    if cache_key in weather_cache:
-        cache_data, timestamp = weather_cache[cache_key]
-        if (datetime.now().timestamp() - timestamp) < CACHE_TTL:
+    """Weather for a city, None if it is unknown.
+
+    `place` picks one of several gazetteer cities sharing the name.
+    Expired weather is returned at once (marked "stale") and refreshed in
+    the background. Raises WeatherUnavailable when OpenWeatherMap fails
+    and nothing is cached.
+    """
+    if place is None:
+        place = gazetteer.resolve(f"{city},{country_code}" if country_code else city)
+    cache_key = location_key(city, country_code, place)
+
+    record = await weather_cache.get(cache_key)
+    if record is None:
+        try:
+            record, city_name = await asyncio.gather(
+                weather_flight.do(
+                    cache_key, _load_weather_record, cache_key, city, country_code, place
+                ),
+                _city_name(cache_key, city, country_code, place, lang),
+            )
+        except Exception as ex:
+            logger.error("Error getting weather")
+            raise WeatherUnavailable() from ex
+        if record is None:
+            return None
+    else:
+        if record.stale:
+            # Answer now with what we have; the next query gets the refreshed weather
+            logger.debug("Stale cached value used")
+            _revalidate(cache_key, city, country_code, place)
+        else:
             logger.debug("Cached value used")
-            return cache_data
+        city_name = await _city_name(cache_key, city, country_code, place, lang)
 
-    try:
-        query = f"{city},{country_code}" if country_code else city
-        url = "/data/2.5/weather"
-
-        async with httpx.AsyncClient(
-            timeout=REQUEST_TIMEOUT,
-            verify=False,
-            base_url=OPENWEATHERMAP_BASE_URL,
-        ) as client:
-            params = {
-                "q": query,
-                "units": "metric",
-                "APPID": OPENWEATHERMAP_API_KEY,
-                "lang": lang, 
-            }
-            response = await client.get(url, params=params)
-            logger.debug("Received response from openweathermap")
-            data = response.json()
-            weather_data = parse_weather_response(data, lang)
-
-            if weather_data:
-                weather_cache[cache_key] = (
-                    weather_data,
-                    datetime.now().timestamp(),
-                )
-                if len(weather_cache) > 100:
-                    oldest_key = next(iter(weather_cache))
-                    weather_cache.pop(oldest_key)
-
-            return weather_data
+    weather_popularity.hit((cache_key, lang), (city, country_code, place))
+    return present_weather(record, lang, city_name)
 
-    except Exception as ex:
-        logger.error("Error getting weather")
-        return None
\ No newline at end of file
+
+async def _city_name(
+    cache_key: str, city: str, country_code: Optional[str], place: Optional[City], lang: str
+) -> Optional[str]:
+    """The city's name in `lang`, None for OpenWeatherMap's English one"""
+    if place is not None:
+        return place.name(lang)
+    if lang not in LOCAL_NAME_LANGS:
+        return None
+    names = await city_names.get(cache_key)
+    if names is None:
+        names = await weather_flight.do(
+            ("names", cache_key), _load_city_names, cache_key, city, country_code
+        )
+    return names.get(lang)
+
+
+async def _load_city_names(cache_key: str, city: str, country_code: Optional[str]) -> Dict[str, str]:
+    params = {
+        "q": f"{city},{country_code}" if country_code else city,
+        "limit": 1,
+        "APPID": OPENWEATHERMAP_API_KEY,
+    }
+    try:
+        with STAGE_SECONDS.time(stage="openweathermap_geocode"):
+            response = await _call_openweathermap("/geo/1.0/direct", params)
+        found = response.json() if response.status_code == 200 else []
+    except Exception:
+        # Nothing is cached, so the next query tries again
+        logger.warning("Error getting city names")
+        return {}
+
+    local_names = (found[0].get("local_names") or {}) if found else {}
+    names = {lang: local_names[lang] for lang in LOCAL_NAME_LANGS if lang in local_names}
+    city_names.set(cache_key, names)
+    return names
+
+
+def _revalidate(cache_key: str, city: str, country_code: Optional[str], place: Optional[City]):
+    if cache_key in weather_flight or owm_breaker.state == "open":
+        return
+    task = asyncio.create_task(
+        weather_flight.do(cache_key, _load_weather_record, cache_key, city, country_code, place)
+    )
+    _revalidations.add(task)
+    task.add_done_callback(_revalidated)
+
+
+def _revalidated(task: asyncio.Task):
+    _revalidations.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Error refreshing stale weather")
+
+
+def cached_weather_data(
+    cache_key: str, lang: str, place: Optional[City], at: Optional[float] = None
+) -> Optional[Dict[str, Any]]:
+    """weather_data from the local cache only, e.g. to render a card ahead of time"""
+    record = weather_cache.local.get(cache_key, count=False)
+    if record is None:
+        return None
+    if place is not None:
+        city_name = place.name(lang)
+    else:
+        city_name = (city_names.local.get(cache_key, count=False) or {}).get(lang)
+    return present_weather(record, lang, city_name, at)
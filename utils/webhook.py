@@ -0,0 +1,229 @@
+import os
+import json
+import signal
+import asyncio
+import multiprocessing
+from typing import Any, Callable, List, Optional
+
+from aiohttp import ClientError, ClientSession, ClientTimeout, TCPConnector, web
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+
+from config import (
+    WEBHOOK_HOST,
+    WEBHOOK_MAX_CONNECTIONS,
+    WEBHOOK_PATH,
+    WEBHOOK_PORT,
+    WEBHOOK_SECRET,
+    WEBHOOK_URL,
+)
+from utils.logger import logger
+
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+WORKER_HOST = "127.0.0.1"
+WORKER_STARTUP_TIMEOUT = 60
+
+
+def worker_port(index: int) -> int:
+    return WEBHOOK_PORT + 1 + index
+
+
+def update_user_id(update: dict) -> Optional[int]:
+    """Id of the user (or chat) an update belongs to, if it has one"""
+    for key, event in update.items():
+        if key == "update_id" or not isinstance(event, dict):
+            continue
+        for field in ("from", "user", "chat"):
+            owner = event.get(field)
+            if isinstance(owner, dict) and isinstance(owner.get("id"), int):
+                return owner["id"]
+    return None
+
+
+def pick_worker(update: dict, workers: int) -> int:
+    """Updates of the same user always go to the same worker"""
+    user_id = update_user_id(update)
+    if user_id is None:
+        user_id = update.get("update_id", 0)
+    return user_id % workers
+
+
+async def set_webhook(bot: Bot, dispatcher: Dispatcher):
+    await bot.set_webhook(
+        url=WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH,
+        secret_token=WEBHOOK_SECRET or None,
+        allowed_updates=dispatcher.resolve_used_update_types(),
+        max_connections=WEBHOOK_MAX_CONNECTIONS,
+    )
+    logger.info("Webhook set")
+
+
+async def _wait_for_termination():
+    stop = asyncio.Event()
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+    except NotImplementedError:
+        pass
+    await stop.wait()
+
+
+async def serve_webhook(dp: Dispatcher, bot: Bot, host: str, port: int):
+    """Run the dispatcher behind an aiohttp webhook endpoint until stopped"""
+    app = web.Application()
+    SimpleRequestHandler(
+        dispatcher=dp, bot=bot, secret_token=WEBHOOK_SECRET or None
+    ).register(app, path=WEBHOOK_PATH)
+    setup_application(app, dp, bot=bot)
+
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, host, port).start()
+        logger.info(f"Webhook served on {host}:{port}{WEBHOOK_PATH}")
+        await _wait_for_termination()
+    finally:
+        await runner.cleanup()
+
+
+class WorkerPool:
+    """Webhook worker processes, restarted when one of them exits.
+
+    Each worker runs `target(index)` in a fresh interpreter with
+    WORKER_INDEX set, serving the webhook on 127.0.0.1:worker_port(index).
+    """
+
+    def __init__(self, target: Callable[[int], Any], workers: int):
+        self.target = target
+        self.workers = workers
+        self.processes: List[multiprocessing.Process] = []
+        self.restarts = 0
+        self._context = multiprocessing.get_context("spawn")
+
+    def _spawn(self, index: int) -> multiprocessing.Process:
+        # Spawned children copy the environment, config.py reads it on import
+        os.environ["WORKER_INDEX"] = str(index)
+        try:
+            process = self._context.Process(
+                target=self.target, args=(index,), name=f"webhook-worker-{index}"
+            )
+            process.start()
+        finally:
+            os.environ.pop("WORKER_INDEX", None)
+        return process
+
+    def start(self):
+        self.processes = [self._spawn(index) for index in range(self.workers)]
+        logger.info(f"Started {self.workers} webhook workers")
+
+    async def wait_ready(self):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + WORKER_STARTUP_TIMEOUT
+        for index in range(self.workers):
+            while True:
+                try:
+                    _, writer = await asyncio.open_connection(WORKER_HOST, worker_port(index))
+                    writer.close()
+                    break
+                except OSError:
+                    if loop.time() > deadline:
+                        raise RuntimeError("Webhook workers did not start in time")
+                    await asyncio.sleep(0.2)
+
+    async def supervise(self):
+        while True:
+            await asyncio.sleep(1)
+            for index, process in enumerate(self.processes):
+                if not process.is_alive():
+                    logger.warning("Webhook worker exited, restarting")
+                    self.restarts += 1
+                    self.processes[index] = self._spawn(index)
+
+    async def stop(self):
+        for process in self.processes:
+            if process.is_alive():
+                process.terminate()
+        for process in self.processes:
+            await asyncio.to_thread(process.join, 10)
+            if process.is_alive():
+                process.kill()
+
+
+class UpdateRouter:
+    """Front endpoint that forwards each update to its user's worker"""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.session: ClientSession | None = None
+
+    async def start(self, app: web.Application):
+        self.session = ClientSession(
+            connector=TCPConnector(limit=WEBHOOK_MAX_CONNECTIONS * 2),
+            timeout=ClientTimeout(total=30),
+        )
+
+    async def close(self, app: web.Application):
+        if self.session is not None:
+            await self.session.close()
+
+    async def handle(self, request: web.Request) -> web.Response:
+        body = await request.read()
+        try:
+            update = json.loads(body)
+        except ValueError:
+            return web.Response(status=400)
+        if not isinstance(update, dict):
+            return web.Response(status=400)
+
+        index = pick_worker(update, self.workers)
+        headers = {"Content-Type": "application/json"}
+        if SECRET_HEADER in request.headers:
+            headers[SECRET_HEADER] = request.headers[SECRET_HEADER]
+
+        url = f"http://{WORKER_HOST}:{worker_port(index)}{WEBHOOK_PATH}"
+        try:
+            async with self.session.post(url, data=body, headers=headers) as response:
+                payload = await response.read()
+                return web.Response(
+                    body=payload,
+                    status=response.status,
+                    content_type=response.content_type,
+                )
+        except (ClientError, asyncio.TimeoutError):
+            # Telegram retries the update on a non-2xx answer
+            logger.error("Webhook worker unavailable")
+            return web.Response(status=503)
+
+
+async def run_webhook_router(
+    bot: Bot, dp: Dispatcher, target: Callable[[int], Any], workers: int
+):
+    """Serve the public webhook port and spread updates over worker processes"""
+    pool = WorkerPool(target, workers)
+    router = UpdateRouter(workers)
+
+    app = web.Application()
+    app.router.add_post(WEBHOOK_PATH, router.handle)
+    app.on_startup.append(router.start)
+    app.on_cleanup.append(router.close)
+    runner = web.AppRunner(app, access_log=None)
+
+    pool.start()
+    supervisor = None
+    try:
+        await pool.wait_ready()
+        await runner.setup()
+        await web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT).start()
+        logger.info(f"Webhook router served on {WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH}")
+
+        await set_webhook(bot, dp)
+        await bot.session.close()
+
+        supervisor = asyncio.create_task(pool.supervise())
+        await _wait_for_termination()
+    finally:
+        if supervisor is not None:
+            supervisor.cancel()
+        await runner.cleanup()
+        await pool.stop()
+        logger.info("Webhook router stopped")